@@ -1,12 +1,30 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, Response, g
-from models import db, Service, Availability, Booking, IntakeForm, Settings, Category, BlockedTime, User, Aftercare, ClientNote, AdminUser, ActivityLog, Client
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, Response, g, has_request_context, abort
+from models import db, Service, Availability, Booking, IntakeForm, Settings, Category, BlockedTime, User, Aftercare, ClientNote, AdminUser, ActivityLog, Client, ClientTag, ClientTagAssignment, EmailCampaign, EmailTemplate, CampaignRecipient, dummy_password_hash, normalize_email, normalize_phone, phone_digits, unsubscribe_tokens
 from datetime import datetime, timedelta, date
-from functools import wraps
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.orm import selectinload, raiseload, joinedload, load_only
+from functools import wraps, lru_cache
+from werkzeug.security import check_password_hash
+import hmac
+from bisect import bisect_left, insort
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate, chain
+from types import MappingProxyType
+import atexit
 import csv
+import hashlib
 import io
+import json
+import logging
 import os
+import queue
+import tempfile
 import threading
 import time
+import uuid
 
 # Load environment variables from .env file (for local development)
 from dotenv import load_dotenv
@@ -28,6 +46,24 @@ else:
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Validated CSV imports wait here between preview and confirm (kept out of the cookie session)
+app.config['IMPORT_DIR'] = os.environ.get('IMPORT_DIR', os.path.join(tempfile.gettempdir(), 'booking-imports'))
+
+# Server-side sessions in Redis when REDIS_URL is set: the cookie only carries a
+# session id and every worker shares the data. Otherwise Flask's signed cookie.
+# The same connection backs the shared caches (None without Redis).
+redis_url = os.environ.get('REDIS_URL')
+redis_client = None
+if redis_url:
+    import redis
+    from flask_session import Session
+    redis_client = redis.Redis.from_url(redis_url)
+    app.config['SESSION_TYPE'] = 'redis'
+    app.config['SESSION_REDIS'] = redis_client
+    Session(app)
+
+# Write app log records (INFO and up) straight to stderr through Flask's default handler
+app.logger.setLevel(logging.INFO)
 
 # Admin credentials from environment variables
 ADMIN_USERNAME = os.environ.get('ADMIN_USERNAME', 'admin')
@@ -74,113 +110,204 @@ def load_current_admin():
     g.current_admin = get_current_admin()
 
 
+# Warn in debug mode when a single request runs more queries than this (likely an N+1)
+QUERY_WARN_THRESHOLD = 30
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def count_request_queries(conn, cursor, statement, parameters, context, executemany):
+    """Count queries per request in debug mode"""
+    if app.debug and has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+@app.after_request
+def warn_on_query_count(response):
+    """Flag requests that ran suspiciously many queries in debug mode"""
+    if app.debug and g.get('query_count', 0) > QUERY_WARN_THRESHOLD:
+        app.logger.warning("[QUERIES] %s %s ran %s queries", request.method, request.path, g.query_count)
+    return response
+
+
+def listing_load_options(*options):
+    """
+    Loader options for hot listing queries. In debug mode any relationship not
+    eager-loaded by these options raises on access instead of lazy-loading.
+    """
+    if app.debug:
+        return options + (raiseload('*'),)
+    return options
+
+
+def paginate_without_count(query, page, per_page):
+    """
+    Fetch one page plus a single lookahead row, returning (items, has_next).
+    Skips the COUNT(*) over the whole filtered set that paginate() runs.
+    """
+    rows = query.limit(per_page + 1).offset((page - 1) * per_page).all()
+    return rows[:per_page], len(rows) > per_page
+
+
+# Precomputed conversions for every minute of the day (used heavily in slot loops)
+_TIME_TO_MIN = {f"{h:02d}:{m:02d}": h * 60 + m for h in range(24) for m in range(60)}
+_MIN_TO_TIME = {mins: time_str for time_str, mins in _TIME_TO_MIN.items()}
+
+
 def time_to_minutes(time_str):
     """Convert time string 'HH:MM' to minutes from midnight"""
-    h, m = map(int, time_str.split(':'))
-    return h * 60 + m
+    minutes = _TIME_TO_MIN.get(time_str)
+    if minutes is None:
+        # Fall back to parsing for unpadded or out-of-range values
+        h, m = map(int, time_str.split(':'))
+        minutes = h * 60 + m
+    return minutes
 
 
 def minutes_to_time(minutes):
     """Convert minutes from midnight to time string 'HH:MM'"""
-    h = minutes // 60
-    m = minutes % 60
-    return f"{h:02d}:{m:02d}"
+    time_str = _MIN_TO_TIME.get(minutes)
+    if time_str is None:
+        # Past midnight (e.g. late appointments running over) - format directly
+        h, m = divmod(minutes, 60)
+        time_str = f"{h:02d}:{m:02d}"
+    return time_str
+
+
+class IntervalIndex:
+    """
+    A set of (start_mins, end_mins) ranges that can quickly answer whether a
+    slot overlaps any of them. Ranges are kept sorted by start alongside a
+    running maximum of their ends: only ranges starting before the slot ends
+    can overlap it, and one of them does if the latest end among them is
+    after the slot starts - a single bisect per check.
+    """
+
+    def __init__(self, ranges=()):
+        self._ranges = sorted(ranges)
+        self._reindex()
+
+    def _reindex(self):
+        self._starts = [start for start, _ in self._ranges]
+        self._max_ends = list(accumulate((end for _, end in self._ranges), max))
+
+    def add(self, start, end):
+        """Add a range to the index"""
+        insort(self._ranges, (start, end))
+        self._reindex()
+
+    def overlaps(self, start, end):
+        """Check if the range start-end overlaps anything in the index"""
+        i = bisect_left(self._starts, end)
+        return i > 0 and self._max_ends[i - 1] > start
+
+
+# Booking status groups used in query filters
+CALENDAR_STATUSES = frozenset(('confirmed', 'no_show', 'completed'))  # shown on the calendar (cancelled hidden)
+CONFLICT_STATUSES = frozenset(('confirmed', 'completed'))              # occupy time when moving/extending
+HISTORY_STATUSES = frozenset(('completed', 'no_show'))                 # past appointments for customers
 
 
-def auto_complete_past_appointments():
+# Admin pages call auto-complete on every load; run the UPDATE at most once a minute
+AUTO_COMPLETE_INTERVAL_SECONDS = 60
+_last_auto_complete = [None]  # time.monotonic() of the last run
+
+
+def auto_complete_past_appointments(force=False):
     """
     Automatically mark confirmed appointments as completed
-    if their end time has passed.
+    if their end time has passed. Skipped (returns 0) if it already ran within
+    AUTO_COMPLETE_INTERVAL_SECONDS, unless force is set.
     """
+    last_run = _last_auto_complete[0]
+    if not force and last_run is not None and time.monotonic() - last_run < AUTO_COMPLETE_INTERVAL_SECONDS:
+        return 0
+    _last_auto_complete[0] = time.monotonic()
+
     now = datetime.now()
     today = now.date()
-    current_time = now.strftime('%H:%M')
+    current_mins = now.hour * 60 + now.minute
 
-    # Get all confirmed bookings that should be completed
+    # Mark confirmed bookings as completed in a single UPDATE
     # Either: date is in the past, OR date is today and end_time has passed
-    past_bookings = Booking.query.filter(
-        Booking.status == 'confirmed'
-    ).all()
-
-    completed_count = 0
-    for booking in past_bookings:
-        # Check if the appointment end time has passed
-        if booking.booking_date < today:
-            # Past date - mark as completed
-            booking.status = 'completed'
-            completed_count += 1
-        elif booking.booking_date == today and booking.end_time <= current_time:
-            # Today but end time has passed - mark as completed
-            booking.status = 'completed'
-            completed_count += 1
+    finished = Booking.query.filter(
+        Booking.status == 'confirmed',
+        db.or_(
+            Booking.booking_date < today,
+            db.and_(Booking.booking_date == today, Booking.end_time_min <= current_mins)
+        )
+    )
+    # Customers whose cached dashboard counts change (only needed when the cache is on)
+    user_ids = []
+    if redis_client is not None:
+        user_ids = [row.user_id for row in finished.with_entities(Booking.user_id).filter(
+            Booking.user_id.isnot(None)
+        ).distinct()]
+    completed_count = finished.update({'status': 'completed'}, synchronize_session=False)
 
     if completed_count > 0:
         db.session.commit()
+        for user_id in user_ids:
+            invalidate_customer_dashboard(user_id)
         print(f"[AUTO-COMPLETE] Marked {completed_count} appointments as completed")
 
     return completed_count
 
 
-def is_time_blocked(booking_date, start_time, end_time):
+def _get_day_blocks(booking_date):
     """
-    Check if a time slot overlaps with any blocked times.
-    Returns True if blocked, False if clear.
+    Get date-specific and recurring blocked times for a date in a single query.
+    Returns (start_time_min, end_time_min, is_all_day) rows rather than ORM objects.
     """
-    start_mins = time_to_minutes(start_time)
-    end_mins = time_to_minutes(end_time)
-    day_of_week = booking_date.weekday()
-
-    # Check for all-day blocks on this specific date
-    all_day_blocks = BlockedTime.query.filter_by(
-        date=booking_date,
-        is_all_day=True,
-        is_recurring_weekly=False
-    ).all()
-
-    if all_day_blocks:
-        return True
-
-    # Check for recurring all-day blocks on this day of week
-    recurring_all_day = BlockedTime.query.filter_by(
-        is_recurring_weekly=True,
-        recurring_day_of_week=day_of_week,
-        is_all_day=True
+    return db.session.execute(
+        db.select(BlockedTime.start_time_min, BlockedTime.end_time_min, BlockedTime.is_all_day).filter(
+            db.or_(
+                db.and_(BlockedTime.date == booking_date, BlockedTime.is_recurring_weekly == False),
+                db.and_(BlockedTime.is_recurring_weekly == True, BlockedTime.recurring_day_of_week == booking_date.weekday())
+            )
+        )
     ).all()
 
-    if recurring_all_day:
-        return True
 
-    # Check for time-specific blocks on this date
-    date_blocks = BlockedTime.query.filter(
-        BlockedTime.date == booking_date,
-        BlockedTime.is_all_day == False,
-        BlockedTime.is_recurring_weekly == False
-    ).all()
+def _blocked_overlap_exists(booking_date, start_mins, end_mins):
+    """EXISTS clause for a blocked time (all-day or overlapping) on this date"""
+    return db.select(BlockedTime.id).filter(
+        db.or_(
+            db.and_(BlockedTime.date == booking_date, BlockedTime.is_recurring_weekly == False),
+            db.and_(BlockedTime.is_recurring_weekly == True, BlockedTime.recurring_day_of_week == booking_date.weekday())
+        ),
+        db.or_(
+            BlockedTime.is_all_day == True,
+            db.and_(BlockedTime.start_time_min < end_mins, BlockedTime.end_time_min > start_mins)
+        )
+    ).exists()
 
-    for block in date_blocks:
-        block_start = time_to_minutes(block.start_time)
-        block_end = time_to_minutes(block.end_time)
 
-        # Check for overlap
-        if start_mins < block_end and end_mins > block_start:
-            return True
+def _booking_overlap_exists(booking_date, start_mins, end_mins):
+    """EXISTS clause for a confirmed booking overlapping this slot"""
+    # Slots overlap if each starts before the other ends
+    return db.select(Booking.id).filter(
+        Booking.booking_date == booking_date,
+        Booking.status == 'confirmed',
+        Booking.booking_time_min < end_mins,
+        Booking.end_time_min > start_mins
+    ).exists()
 
-    # Check for recurring time-specific blocks on this day of week
-    recurring_blocks = BlockedTime.query.filter(
-        BlockedTime.is_recurring_weekly == True,
-        BlockedTime.recurring_day_of_week == day_of_week,
-        BlockedTime.is_all_day == False
-    ).all()
 
-    for block in recurring_blocks:
-        block_start = time_to_minutes(block.start_time)
-        block_end = time_to_minutes(block.end_time)
+def get_day_blocks(booking_date):
+    """Blocked time rows from _get_day_blocks, memoized for the current request"""
+    cache = g.setdefault('day_blocks', {})
+    if booking_date not in cache:
+        cache[booking_date] = _get_day_blocks(booking_date)
+    return cache[booking_date]
 
-        # Check for overlap
-        if start_mins < block_end and end_mins > block_start:
-            return True
 
-    return False
+def is_time_blocked(booking_date, start_time, end_time):
+    """
+    Check if a time slot overlaps with any blocked times.
+    Returns True if blocked, False if clear.
+    """
+    exists_clause = _blocked_overlap_exists(booking_date, time_to_minutes(start_time), time_to_minutes(end_time))
+    return db.session.execute(db.select(exists_clause)).scalar()
 
 
 def check_slot_available(booking_date, start_time, end_time):
@@ -191,97 +318,248 @@ def check_slot_available(booking_date, start_time, end_time):
     start_mins = time_to_minutes(start_time)
     end_mins = time_to_minutes(end_time)
 
-    # First check if the time is blocked
-    if is_time_blocked(booking_date, start_time, end_time):
-        return False
-
-    # Get all bookings for this date
-    existing_bookings = Booking.query.filter_by(
-        booking_date=booking_date,
-        status='confirmed'
-    ).all()
+    # One round-trip; the database stops at the first conflicting row
+    conflict = db.session.execute(db.select(db.or_(
+        _booking_overlap_exists(booking_date, start_mins, end_mins),
+        _blocked_overlap_exists(booking_date, start_mins, end_mins)
+    ))).scalar()
 
-    for booking in existing_bookings:
-        existing_start = time_to_minutes(booking.booking_time)
-        existing_end = time_to_minutes(booking.end_time)
+    return not conflict
 
-        # Check for overlap: slots overlap if one starts before the other ends
-        if start_mins < existing_end and end_mins > existing_start:
-            return False
 
-    return True
+def lock_booking_day(booking_date):
+    """
+    Serialize bookings for a date until the current transaction ends, so a
+    check_slot_available followed by an insert can't race another booking.
+    Call before making any writes in the request: on SQLite the read-only
+    transaction so far is rolled back to start a new one.
+    """
+    if db.session.new or db.session.dirty or db.session.deleted:
+        raise RuntimeError('lock_booking_day must be called before any writes in the session')
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # Transaction-scoped advisory lock keyed on the date
+        db.session.execute(db.text('SELECT pg_advisory_xact_lock(:key)'), {'key': booking_date.toordinal()})
+    elif dialect == 'sqlite':
+        # SQLite locks the whole database; take the write lock before reading
+        db.session.rollback()
+        db.session.execute(db.text('BEGIN IMMEDIATE'))
 
 
 def is_day_fully_blocked(booking_date):
     """Check if an entire day is blocked (all-day block exists)."""
-    day_of_week = booking_date.weekday()
+    return any(block.is_all_day for block in get_day_blocks(booking_date))
 
-    # Check for all-day block on this specific date
-    all_day_block = BlockedTime.query.filter_by(
-        date=booking_date,
-        is_all_day=True,
-        is_recurring_weekly=False
-    ).first()
 
-    if all_day_block:
-        return True
+def _load_day_constraints(booking_date):
+    """
+    Load everything that can make a slot unavailable on a given date in one go.
+    Returns (fully_blocked, blocked_ranges, booking_ranges) where the ranges are
+    lists of (start_mins, end_mins) tuples.
+    """
+    fully_blocked = False
+    blocked_ranges = []
+    for block in get_day_blocks(booking_date):
+        if block.is_all_day:
+            fully_blocked = True
+        elif block.start_time_min is not None and block.end_time_min is not None:
+            blocked_ranges.append((block.start_time_min, block.end_time_min))
+
+    # Confirmed bookings for this day
+    booking_ranges = [tuple(row) for row in db.session.execute(
+        db.select(Booking.booking_time_min, Booking.end_time_min).filter_by(
+            booking_date=booking_date,
+            status='confirmed'
+        )
+    )]
 
-    # Check for recurring all-day block on this day of week
-    recurring_all_day = BlockedTime.query.filter_by(
-        is_recurring_weekly=True,
-        recurring_day_of_week=day_of_week,
-        is_all_day=True
-    ).first()
+    blocked_ranges.sort()
+    booking_ranges.sort()
+    return fully_blocked, blocked_ranges, booking_ranges
 
-    if recurring_all_day:
-        return True
 
-    return False
+def get_day_constraints(booking_date):
+    """Day constraints from _load_day_constraints, memoized for the current request"""
+    cache = g.setdefault('day_constraints', {})
+    if booking_date not in cache:
+        cache[booking_date] = _load_day_constraints(booking_date)
+    return cache[booking_date]
 
 
-def get_available_slots_for_date(service, booking_date_obj):
+def get_active_availability():
     """
-    Generate available time slots for a given service and date.
-    Uses 30-minute intervals, accounts for service duration, and checks for conflicts.
+    Active availability windows grouped by day of week, memoized for the current request.
+    Returns {day_of_week: [(start_time, end_time) rows]}.
     """
-    # First check if the entire day is blocked
-    if is_day_fully_blocked(booking_date_obj):
-        return []
+    if 'active_availability' not in g:
+        by_day = defaultdict(list)
+        for row in db.session.execute(
+            db.select(Availability.day_of_week, Availability.start_time, Availability.end_time)
+            .filter_by(is_active=True).order_by(Availability.id)
+        ):
+            by_day[row.day_of_week].append(row)
+        g.active_availability = by_day
+    return g.active_availability
 
-    day_of_week = booking_date_obj.weekday()
 
-    # Get availability for this day
-    availability = Availability.query.filter_by(
-        day_of_week=day_of_week,
-        is_active=True
+# Active services/categories are cached per process as plain rows. Commits touching
+# either model bump the version; the TTL bounds staleness across workers.
+CATALOG_CACHE_TTL_SECONDS = 60
+_catalog_version = [0]
+
+
+def bump_catalog_version():
+    """Invalidate this process's cached services and categories"""
+    _catalog_version[0] += 1
+
+
+@event.listens_for(db.session, 'after_flush')
+def note_catalog_changes(session, flush_context):
+    """Remember that this transaction changed a service or category"""
+    if any(isinstance(obj, (Service, Category)) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['catalog_changed'] = True
+
+
+@event.listens_for(db.session, 'after_bulk_update')
+def note_catalog_bulk_update(update_context):
+    """Query.update() skips the flush, so catch bulk updates to services/categories"""
+    if update_context.mapper.class_ in (Service, Category):
+        update_context.session.info['catalog_changed'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_catalog_cache(session):
+    if session.info.pop('catalog_changed', False):
+        bump_catalog_version()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_catalog_changes(session):
+    session.info.pop('catalog_changed', None)
+
+
+def _catalog_cache_key():
+    return _catalog_version[0], int(time.monotonic() // CATALOG_CACHE_TTL_SECONDS)
+
+
+@lru_cache(maxsize=1)
+def _get_active_services_cached(version, ttl_bucket):
+    return tuple(db.session.execute(
+        db.select(Service.id, Service.name, Service.duration_minutes, Service.price,
+                  Service.description, Service.category_id)
+        .filter_by(is_active=True).order_by(Service.id)
+    ))
+
+
+@lru_cache(maxsize=1)
+def _get_active_categories_cached(version, ttl_bucket):
+    return tuple(db.session.execute(
+        db.select(Category.id, Category.name)
+        .filter_by(is_active=True).order_by(Category.display_order)
+    ))
+
+
+def get_active_services():
+    """Active services as read-only rows (id, name, duration_minutes, price, description, category_id)"""
+    return _get_active_services_cached(*_catalog_cache_key())
+
+
+@lru_cache(maxsize=1)
+def _get_services_by_name_cached(version, ttl_bucket):
+    return MappingProxyType({
+        s.name: (s.id, s.duration_minutes, s.price)
+        for s in _get_active_services_cached(version, ttl_bucket)
+    })
+
+
+def get_services_by_name():
+    """Read-only {name: (id, duration_minutes, price)} for active services"""
+    return _get_services_by_name_cached(*_catalog_cache_key())
+
+
+def get_active_categories():
+    """Active categories as read-only (id, name) rows in display order"""
+    return _get_active_categories_cached(*_catalog_cache_key())
+
+
+@lru_cache(maxsize=256)
+def _get_services_summary_cached(service_ids, version, ttl_bucket):
+    rows = db.session.execute(
+        db.select(Service.name, Service.duration_minutes)
+        .filter(Service.id.in_(service_ids)).order_by(Service.id)
     ).all()
+    if not rows:
+        return None
+    return ', '.join(row.name for row in rows), sum(row.duration_minutes for row in rows)
 
-    if not availability:
-        return []
 
-    slots = []
-    service_duration = service.duration_minutes
+def get_services_summary(service_ids):
+    """(names, total_duration) for services by id, active or not, or None if none exist"""
+    return _get_services_summary_cached(tuple(sorted(set(service_ids))), *_catalog_cache_key())
 
-    for avail in availability:
-        start_mins = time_to_minutes(avail.start_time)
-        end_mins = time_to_minutes(avail.end_time)
 
-        # Generate slots at 30-minute intervals
-        current = start_mins
-        while current + service_duration <= end_mins:
-            slot_start = minutes_to_time(current)
-            slot_end = minutes_to_time(current + service_duration)
+# Client counts for the client list and campaign pages, cached the same way.
+# Client commits bump the version; bulk writes must call bump_client_counts_version().
+CLIENT_COUNTS_CACHE_TTL_SECONDS = 60
+_client_counts_version = [0]
 
-            # Check if this slot is available (no conflicts with bookings or blocked times)
-            if check_slot_available(booking_date_obj, slot_start, slot_end):
-                slots.append({
-                    'start': slot_start,
-                    'end': slot_end
-                })
 
-            current += 30  # 30-minute intervals
+def bump_client_counts_version():
+    """Invalidate this process's cached client counts"""
+    _client_counts_version[0] += 1
+
+
+@event.listens_for(db.session, 'after_flush')
+def note_client_changes(session, flush_context):
+    if any(isinstance(obj, Client) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['clients_changed'] = True
+
+
+@event.listens_for(db.session, 'after_bulk_update')
+def note_client_bulk_update(update_context):
+    if update_context.mapper.class_ is Client:
+        update_context.session.info['clients_changed'] = True
+
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_client_counts(session):
+    if session.info.pop('clients_changed', False):
+        bump_client_counts_version()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_client_changes(session):
+    session.info.pop('clients_changed', None)
 
-    return slots
+
+@lru_cache(maxsize=1)
+def _get_client_counts_cached(version, ttl_bucket):
+    opted_in = db.and_(Client.email_opt_in == True, Client.unsubscribed_at.is_(None))
+    return db.session.execute(db.select(
+        db.func.count(Client.id).label('total'),
+        db.func.count(db.case((opted_in, 1))).label('opted_in'),
+        db.func.count(db.case((db.and_(opted_in, Client.email.isnot(None)), 1))).label('emailable')
+    )).one()
+
+
+def get_client_counts():
+    """Cached (total, opted_in, emailable) client counts in one query; emailable is opted in with an email"""
+    ttl_bucket = int(time.monotonic() // CLIENT_COUNTS_CACHE_TTL_SECONDS)
+    return _get_client_counts_cached(_client_counts_version[0], ttl_bucket)
+
+
+@lru_cache(maxsize=512)
+def _candidate_starts(start_mins, end_mins, duration_minutes):
+    """Slot start times (in minutes) at 30-minute intervals that fit within a window"""
+    return tuple(range(start_mins, end_mins - duration_minutes + 1, 30))
+
+
+def get_available_slots_for_date(service, booking_date_obj):
+    """
+    Generate available time slots for a given service and date.
+    Uses 30-minute intervals, accounts for service duration, and checks for conflicts.
+    """
+    return get_available_slots_for_duration(service.duration_minutes, booking_date_obj)
 
 
 def get_available_slots_for_duration(duration_minutes, booking_date_obj):
@@ -289,47 +567,115 @@ def get_available_slots_for_duration(duration_minutes, booking_date_obj):
     Generate available time slots for a given duration and date.
     Used for multi-service bookings where we need to calculate based on total duration.
     """
-    # First check if the entire day is blocked
-    if is_day_fully_blocked(booking_date_obj):
-        return []
+    # Read-only path: skip the autoflush scan of the session before each query
+    with db.session.no_autoflush:
+        fully_blocked, blocked_ranges, booking_ranges = get_day_constraints(booking_date_obj)
 
-    day_of_week = booking_date_obj.weekday()
+        # Nothing to offer if the entire day is blocked
+        if fully_blocked:
+            return []
 
-    # Get availability for this day
-    availability = Availability.query.filter_by(
-        day_of_week=day_of_week,
-        is_active=True
-    ).all()
+        day_of_week = booking_date_obj.weekday()
+
+        # Get availability windows for this day
+        availability = get_active_availability()[day_of_week]
 
     if not availability:
         return []
 
+    # Blocked times and existing bookings both rule a slot out
+    taken = IntervalIndex(blocked_ranges + booking_ranges)
     slots = []
 
     for avail in availability:
-        start_mins = time_to_minutes(avail.start_time)
-        end_mins = time_to_minutes(avail.end_time)
+        candidates = _candidate_starts(time_to_minutes(avail.start_time), time_to_minutes(avail.end_time), duration_minutes)
 
-        # Generate slots at 30-minute intervals
-        current = start_mins
-        while current + duration_minutes <= end_mins:
-            slot_start = minutes_to_time(current)
-            slot_end = minutes_to_time(current + duration_minutes)
+        for slot_start in candidates:
+            slot_end = slot_start + duration_minutes
 
-            # Check if this slot is available (no conflicts with bookings or blocked times)
-            if check_slot_available(booking_date_obj, slot_start, slot_end):
+            # Check for overlap with anything already taken
+            if not taken.overlaps(slot_start, slot_end):
                 slots.append({
-                    'start': slot_start,
-                    'end': slot_end
+                    'start': minutes_to_time(slot_start),
+                    'end': minutes_to_time(slot_end)
                 })
 
-            current += 30  # 30-minute intervals
-
     return slots
 
 
-def validate_csv_row(row, row_num, services_dict):
-    """Validate a single CSV row and return errors if any"""
+def parse_csv_date(value):
+    """Parse a CSV booking date in YYYY-MM-DD format (raises ValueError if invalid)"""
+    return datetime.strptime(value.strip(), '%Y-%m-%d').date()
+
+
+def collect_csv_dates(rows):
+    """Get the set of valid booking dates mentioned in CSV rows"""
+    dates = set()
+    for row in rows:
+        try:
+            dates.add(parse_csv_date(row.get('booking_date') or ''))
+        except ValueError:
+            pass
+    return dates
+
+
+def load_taken_ranges(dates):
+    """
+    Load everything already occupying time on the given dates in two queries.
+    Returns {date: IntervalIndex} covering confirmed bookings and blocked
+    times (all-day blocks cover the whole day).
+    """
+    taken_by_date = {d: [] for d in dates}
+    if not taken_by_date:
+        return {}
+
+    bookings = db.session.execute(
+        db.select(Booking.booking_date, Booking.booking_time_min, Booking.end_time_min).filter(
+            Booking.booking_date.in_(taken_by_date),
+            Booking.status == 'confirmed'
+        )
+    ).all()
+
+    for b in bookings:
+        taken_by_date[b.booking_date].append((b.booking_time_min, b.end_time_min))
+
+    blocks = db.session.execute(
+        db.select(
+            BlockedTime.date, BlockedTime.start_time_min, BlockedTime.end_time_min, BlockedTime.is_all_day,
+            BlockedTime.is_recurring_weekly, BlockedTime.recurring_day_of_week
+        ).filter(
+            db.or_(
+                db.and_(BlockedTime.date.in_(taken_by_date), BlockedTime.is_recurring_weekly == False),
+                BlockedTime.is_recurring_weekly == True
+            )
+        )
+    ).all()
+
+    for block in blocks:
+        if block.is_all_day:
+            block_range = (0, float('inf'))
+        elif block.start_time_min is not None and block.end_time_min is not None:
+            block_range = (block.start_time_min, block.end_time_min)
+        else:
+            continue
+
+        if block.is_recurring_weekly:
+            for d, taken in taken_by_date.items():
+                if d.weekday() == block.recurring_day_of_week:
+                    taken.append(block_range)
+        else:
+            taken_by_date[block.date].append(block_range)
+
+    return {d: IntervalIndex(ranges) for d, ranges in taken_by_date.items()}
+
+
+def validate_csv_row(row, row_num, services_by_name, taken_by_date):
+    """
+    Validate a single CSV row and return errors if any.
+    services_by_name comes from get_services_by_name.
+    taken_by_date comes from load_taken_ranges; valid rows are added to it so
+    later rows in the same file are checked against them too.
+    """
     errors = []
 
     # Check required fields
@@ -343,15 +689,15 @@ def validate_csv_row(row, row_num, services_dict):
 
     # Validate service exists
     service_name = row['service_name'].strip()
-    if service_name not in services_dict:
+    if service_name not in services_by_name:
         errors.append(f"Row {row_num}: Service '{service_name}' not found")
         return errors, None
 
-    service = services_dict[service_name]
+    service_id, duration_minutes, price = services_by_name[service_name]
 
     # Validate date format
     try:
-        booking_date = datetime.strptime(row['booking_date'].strip(), '%Y-%m-%d').date()
+        booking_date = parse_csv_date(row['booking_date'])
     except ValueError:
         errors.append(f"Row {row_num}: Invalid date format '{row['booking_date']}'. Use YYYY-MM-DD")
         return errors, None
@@ -370,36 +716,101 @@ def validate_csv_row(row, row_num, services_dict):
 
     # Calculate end time
     start_mins = time_to_minutes(booking_time)
-    end_mins = start_mins + service.duration_minutes
+    end_mins = start_mins + duration_minutes
     end_time = minutes_to_time(end_mins)
 
-    # Check for duplicate/overlapping bookings
-    if not check_slot_available(booking_date, booking_time, end_time):
+    # Check for duplicate/overlapping bookings, including earlier rows in this file
+    taken = taken_by_date.setdefault(booking_date, IntervalIndex())
+    if taken.overlaps(start_mins, end_mins):
         errors.append(f"Row {row_num}: Time slot {booking_time} on {booking_date} conflicts with existing booking")
         return errors, None
+    taken.add(start_mins, end_mins)
 
     # Return validated data
     return errors, {
         'customer_name': row['customer_name'].strip(),
         'customer_email': row['customer_email'].strip(),
         'customer_phone': row.get('customer_phone', '').strip(),
-        'service': service,
+        'service_id': service_id,
         'booking_date': booking_date,
         'booking_time': booking_time,
         'end_time': end_time
     }
 
 
-def parse_csv_file(file_content):
-    """Parse CSV content and return rows"""
-    # Try to detect the encoding and handle BOM
+# Previewed imports not confirmed within an hour are discarded
+PENDING_IMPORT_MAX_AGE_SECONDS = 60 * 60
+
+
+def _pending_import_path(token):
+    """File holding a pending import; None if the token isn't one we issued"""
     try:
-        content = file_content.decode('utf-8-sig')
-    except UnicodeDecodeError:
-        content = file_content.decode('latin-1')
+        token = uuid.UUID(hex=token).hex
+    except (TypeError, ValueError):
+        return None
+    return os.path.join(app.config['IMPORT_DIR'], f'{token}.json')
+
+
+def sweep_pending_imports():
+    """Delete pending imports that were previewed but never confirmed"""
+    cutoff = time.time() - PENDING_IMPORT_MAX_AGE_SECONDS
+    with os.scandir(app.config['IMPORT_DIR']) as entries:
+        for entry in entries:
+            if entry.name.endswith('.json') and entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass  # Another worker got there first
+
+
+def save_pending_import(rows, errors):
+    """Store validated import rows and preview errors server-side, returning a token for the session"""
+    os.makedirs(app.config['IMPORT_DIR'], exist_ok=True)
+    sweep_pending_imports()
+    token = uuid.uuid4().hex
+    with open(_pending_import_path(token), 'w') as f:
+        json.dump({'rows': rows, 'errors': errors}, f)
+    return token
+
+
+def load_pending_import(token):
+    """Load a pending import saved by save_pending_import, or None if it's gone"""
+    path = _pending_import_path(token)
+    if not path or not os.path.exists(path):
+        return None
+    if os.path.getmtime(path) < time.time() - PENDING_IMPORT_MAX_AGE_SECONDS:
+        return None
+    with open(path) as f:
+        return json.load(f)
 
-    reader = csv.DictReader(io.StringIO(content))
-    return list(reader)
+
+def discard_pending_import(token):
+    """Delete a pending import file"""
+    path = _pending_import_path(token)
+    if path and os.path.exists(path):
+        os.remove(path)
+
+
+def parse_csv_file(stream, encoding='utf-8-sig'):
+    """Parse an uploaded CSV stream and yield rows one at a time, without reading it all into memory"""
+    stream.seek(0)
+    text = io.TextIOWrapper(stream, encoding=encoding, newline='')
+    try:
+        yield from csv.DictReader(text)
+    finally:
+        # Leave the upload stream open so it can be read again
+        text.detach()
+
+
+def scan_csv_dates(stream):
+    """
+    First pass over an uploaded CSV: work out its encoding and collect its dates.
+    Returns (encoding, dates); files that aren't valid UTF-8 are read as Latin-1.
+    """
+    try:
+        return 'utf-8-sig', collect_csv_dates(parse_csv_file(stream))
+    except UnicodeDecodeError:
+        return 'latin-1', collect_csv_dates(parse_csv_file(stream, 'latin-1'))
 
 
 @app.route('/')
@@ -418,10 +829,17 @@ def admin_login():
         username = request.form.get('username', '')
         password = request.form.get('password', '')
 
-        # First try database authentication
+        # First try database authentication (username is uniquely indexed)
         admin_user = AdminUser.query.filter_by(username=username, is_active=True).first()
 
-        if admin_user and admin_user.check_password(password):
+        if admin_user:
+            password_ok = admin_user.check_password(password)
+        else:
+            # Hash anyway so unknown usernames can't be told apart by response time
+            check_password_hash(dummy_password_hash(), password)
+            password_ok = False
+
+        if password_ok:
             # Database user login
             session['admin_logged_in'] = True
             session['admin_user_id'] = admin_user.id
@@ -444,7 +862,8 @@ def admin_login():
             return redirect(next_page or url_for('admin_calendar'))
 
         # Fallback to environment variable authentication (for initial setup / backwards compatibility)
-        elif username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
+        elif (hmac.compare_digest(username.encode(), ADMIN_USERNAME.encode())
+              and hmac.compare_digest(password.encode(), ADMIN_PASSWORD.encode())):
             session['admin_logged_in'] = True
             session['admin_name'] = 'Owner'
             session['admin_role'] = 'owner'
@@ -472,7 +891,7 @@ def admin_logout():
 @app.route('/admin/categories')
 @login_required
 def admin_categories():
-    categories = Category.query.filter_by(is_active=True).order_by(Category.display_order).all()
+    categories = Category.query.options(*listing_load_options(selectinload(Category.services))).filter_by(is_active=True).order_by(Category.display_order).all()
     uncategorised = Service.query.filter_by(is_active=True, category_id=None).order_by(Service.name).all()
     return render_template('admin_categories.html', categories=categories, uncategorised=uncategorised)
 
@@ -533,16 +952,32 @@ def delete_category(category_id):
     return redirect(url_for('admin_categories'))
 
 
+def parse_reorder_ids(payload):
+    """The 'order' list of ids from a reorder request as ints, or None if it is malformed"""
+    if not isinstance(payload, dict) or not isinstance(payload.get('order', []), list):
+        return None
+    try:
+        return [int(item_id) for item_id in payload.get('order', [])]
+    except (TypeError, ValueError):
+        return None
+
+
 @app.route('/admin/categories/reorder', methods=['POST'])
 @login_required
 def reorder_categories():
     """Reorder categories via AJAX"""
-    order = request.json.get('order', [])
-    for index, cat_id in enumerate(order):
-        category = Category.query.get(cat_id)
-        if category:
-            category.display_order = index
+    order = parse_reorder_ids(request.get_json(silent=True))
+    if order is None:
+        return jsonify({'success': False, 'error': 'order must be a list of ids'}), 400
+
+    # One SELECT to skip unknown ids, then a single bulk UPDATE
+    existing_ids = set(db.session.execute(db.select(Category.id).filter(Category.id.in_(order))).scalars())
+    db.session.bulk_update_mappings(Category, [
+        {'id': cat_id, 'display_order': index}
+        for index, cat_id in enumerate(order) if cat_id in existing_ids
+    ])
     db.session.commit()
+    bump_catalog_version()  # Bulk mappings skip the flush events
     return jsonify({'success': True})
 
 
@@ -553,13 +988,14 @@ def move_service_to_category():
     service_id = request.form.get('service_id')
     category_id = request.form.get('category_id')
 
-    service = Service.query.get_or_404(service_id)
+    # Identity-map lookup; only the category name is needed, so don't load the row
+    service = db.get_or_404(Service, service_id)
 
     if category_id:
         # Moving to a category
-        category = Category.query.get_or_404(category_id)
-        service.category_id = category.id
-        flash(f'"{service.name}" moved to {category.name}.', 'success')
+        category_name = db.first_or_404(db.select(Category.name).filter_by(id=category_id))
+        service.category_id = int(category_id)
+        flash(f'"{service.name}" moved to {category_name}.', 'success')
     else:
         # Moving to uncategorised
         service.category_id = None
@@ -575,7 +1011,7 @@ def move_service_to_category():
 @login_required
 def admin_services():
     # Get all categories with their services
-    categories = Category.query.filter_by(is_active=True).order_by(Category.display_order).all()
+    categories = Category.query.options(*listing_load_options(selectinload(Category.services))).filter_by(is_active=True).order_by(Category.display_order).all()
 
     # Get uncategorized services
     uncategorized = Service.query.filter_by(is_active=True, category_id=None).order_by(Service.display_order).all()
@@ -586,7 +1022,7 @@ def admin_services():
 @app.route('/admin/services/add', methods=['GET', 'POST'])
 @login_required
 def add_service():
-    categories = Category.query.filter_by(is_active=True).order_by(Category.display_order).all()
+    categories = get_active_categories()
 
     if request.method == 'POST':
         name = request.form['name']
@@ -619,7 +1055,7 @@ def add_service():
 @login_required
 def edit_service(service_id):
     service = Service.query.get_or_404(service_id)
-    categories = Category.query.filter_by(is_active=True).order_by(Category.display_order).all()
+    categories = get_active_categories()
 
     if request.method == 'POST':
         service.name = request.form['name']
@@ -662,13 +1098,17 @@ def move_service_category(service_id):
 @login_required
 def reorder_services():
     """Reorder services within a category via AJAX"""
-    order = request.json.get('order', [])
+    order = parse_reorder_ids(request.get_json(silent=True))
+    if order is None:
+        return jsonify({'success': False, 'error': 'order must be a list of ids'}), 400
     category_id = request.json.get('category_id')  # Can be None for uncategorized
 
-    for index, service_id in enumerate(order):
-        service = Service.query.get(service_id)
-        if service:
-            service.display_order = index
+    # One SELECT to skip unknown ids, then a single bulk UPDATE
+    existing_ids = set(db.session.execute(db.select(Service.id).filter(Service.id.in_(order))).scalars())
+    db.session.bulk_update_mappings(Service, [
+        {'id': service_id, 'display_order': index}
+        for index, service_id in enumerate(order) if service_id in existing_ids
+    ])
     db.session.commit()
     return jsonify({'success': True})
 
@@ -767,22 +1207,18 @@ def add_blocked_time():
             start_date = datetime.strptime(request.form['start_date'], '%Y-%m-%d').date()
             end_date = datetime.strptime(request.form['end_date'], '%Y-%m-%d').date()
 
-            # Create a blocked time for each day in the range
-            current_date = start_date
-            count = 0
-            while current_date <= end_date:
-                blocked = BlockedTime(
-                    date=current_date,
-                    start_time=None,
-                    end_time=None,
-                    reason=reason,
-                    is_all_day=True,
-                    is_recurring_weekly=False
-                )
-                db.session.add(blocked)
-                current_date += timedelta(days=1)
-                count += 1
-
+            # Create a blocked time for each day in the range in a single bulk insert
+            rows = [{
+                'date': start_date + timedelta(days=offset),
+                'start_time': None,
+                'end_time': None,
+                'reason': reason,
+                'is_all_day': True,
+                'is_recurring_weekly': False
+            } for offset in range((end_date - start_date).days + 1)]
+            count = len(rows)
+
+            db.session.bulk_insert_mappings(BlockedTime, rows)
             db.session.commit()
             flash(f'Blocked {count} days successfully!', 'success')
 
@@ -844,12 +1280,7 @@ def add_quick_blocked_time():
         )
     else:
         # Calculate end time based on duration
-        start_parts = start_time.split(':')
-        start_minutes = int(start_parts[0]) * 60 + int(start_parts[1])
-        end_minutes = start_minutes + int(duration)
-        end_hour = end_minutes // 60
-        end_minute = end_minutes % 60
-        end_time = f"{end_hour:02d}:{end_minute:02d}"
+        end_time = minutes_to_time(time_to_minutes(start_time) + int(duration))
 
         blocked = BlockedTime(
             date=block_date,
@@ -870,6 +1301,100 @@ def add_quick_blocked_time():
 
 # ==================== ADMIN: CALENDAR ====================
 
+# Calendar colour slugs, checked in order against the lowercased category name
+CATEGORY_SLUG_RULES = (
+    ('ear', 'ears'),
+    ('nose', 'nose'),
+    ('nostril', 'nose'),
+    ('consult', 'consultation'),
+    ('jewel', 'service'),
+    ('under', 'under16'),
+    ('16', 'under16'),
+    ('body', 'body'),
+    ('lip', 'lips'),
+    ('face', 'face'),
+    ('facial', 'face'),
+)
+
+
+@lru_cache(maxsize=128)
+def get_category_slug(category_name):
+    """CSS-safe colour slug for a category name ('other' if nothing matches)"""
+    name = category_name.lower()
+    return next((slug for keyword, slug in CATEGORY_SLUG_RULES if keyword in name), 'other')
+
+
+def slot_range(start_mins, end_mins, day_start, slot_count):
+    """Indexes of the 15-minute day view slots whose start falls within [start_mins, end_mins)"""
+    first = max(0, -((day_start - start_mins) // 15))
+    last = min(slot_count, -((day_start - end_mins) // 15))
+    return range(first, last)
+
+
+def block_duration(block):
+    """Length of a timed block in minutes (None for blocks without times)"""
+    if block.start_time_min is None or block.end_time_min is None:
+        return None
+    return block.end_time_min - block.start_time_min
+
+
+def calendar_booking_rows(*criteria):
+    """
+    Calendar bookings as plain rows (with service and category names joined in),
+    ordered by date and time. Only the columns the calendar displays are selected.
+    """
+    return db.session.execute(
+        db.select(
+            Booking.id, Booking.booking_date, Booking.booking_time, Booking.end_time,
+            Booking.booking_time_min, Booking.end_time_min, Booking.customer_name,
+            Booking.customer_email, Booking.service_id, Booking.status,
+            Service.name.label('service_name'), Service.price.label('service_price'),
+            Category.name.label('category_name')
+        ).join(Service, Booking.service_id == Service.id)
+        .outerjoin(Category, Service.category_id == Category.id)
+        .filter(Booking.status.in_(CALENDAR_STATUSES), *criteria)
+        .order_by(Booking.booking_date, Booking.booking_time)
+    ).all()
+
+
+def calendar_block_rows(*criteria, order_by=(BlockedTime.id,)):
+    """Blocked times as plain rows with only the columns the calendar displays"""
+    return db.session.execute(
+        db.select(
+            BlockedTime.id, BlockedTime.date, BlockedTime.start_time, BlockedTime.end_time,
+            BlockedTime.start_time_min, BlockedTime.end_time_min, BlockedTime.reason,
+            BlockedTime.is_all_day, BlockedTime.is_recurring_weekly, BlockedTime.recurring_day_of_week
+        ).filter(*criteria).order_by(*order_by)
+    ).all()
+
+
+def client_notes_flags(bookings):
+    """
+    Map booking id -> whether the customer's Client profile has notes.
+    Only the clients matching these bookings' emails are looked up.
+    """
+    emails = {b.customer_email.lower().strip() for b in bookings if b.customer_email}
+    emails_with_notes = set()
+    if emails:
+        try:
+            client_email = db.func.lower(db.func.trim(Client.email))
+            emails_with_notes = set(db.session.execute(
+                db.select(client_email).filter(
+                    client_email.in_(emails),
+                    Client.notes.isnot(None),
+                    db.func.trim(Client.notes) != ''
+                ).distinct()
+            ).scalars())
+        except Exception as e:
+            print(f"[CALENDAR] Notes lookup error: {e}")
+
+    return {
+        b.id: bool(b.customer_email) and b.customer_email.lower().strip() in emails_with_notes
+        for b in bookings
+    }
+
+
+
 @app.route('/admin/calendar')
 @login_required
 def admin_calendar():
@@ -880,20 +1405,11 @@ def admin_calendar():
     view = request.args.get('view', 'week')  # 'day', 'week' or 'month'
     date_str = request.args.get('date')
 
-    # Build set of emails that have notes - simplified approach using Client accounts
-    emails_with_notes = set()
-    try:
-        # Get all clients with notes in their profile
-        for client in Client.query.all():
-            if client.notes and client.notes.strip() and client.email:
-                emails_with_notes.add(client.email.lower().strip())
-    except Exception as e:
-        print(f"[CALENDAR] Notes lookup error: {e}")
-
+    today = date.today()
     if date_str:
         current_date = datetime.strptime(date_str, '%Y-%m-%d').date()
     else:
-        current_date = date.today()
+        current_date = today
 
     days_of_week = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
 
@@ -905,7 +1421,8 @@ def admin_calendar():
 
         # Get availability for this day of week
         day_of_week = current_date.weekday()
-        availability = Availability.query.filter_by(day_of_week=day_of_week, is_active=True).first()
+        day_windows = get_active_availability()[day_of_week]
+        availability = day_windows[0] if day_windows else None
 
         # For admin day view, always show full day 9am-9pm for full visibility
         # Admin needs to see all times, even outside normal operating hours
@@ -923,99 +1440,85 @@ def admin_calendar():
                 slot_time = f"{hour:02d}:{minute:02d}"
                 time_slots.append({
                     'time': slot_time,
+                    'hour': hour,
+                    'minute': minute,
                     'booking': None,
                     'blocked': None
                 })
 
-        # Get bookings for this day
-        day_bookings = Booking.query.filter(
-            Booking.booking_date == current_date,
-            Booking.status.in_(['confirmed', 'no_show', 'completed'])
-        ).order_by(Booking.booking_time).all()
-
-        # Get blocked times for this day
-        day_blocks = BlockedTime.query.filter_by(
-            date=current_date,
-            is_recurring_weekly=False
-        ).all()
-
-        # Get recurring blocks
-        recurring_blocks = BlockedTime.query.filter_by(
-            is_recurring_weekly=True,
-            recurring_day_of_week=day_of_week
-        ).all()
+        # Get bookings for this day, with service and category in the same query
+        day_bookings = calendar_booking_rows(Booking.booking_date == current_date)
+        notes_flags = client_notes_flags(day_bookings)
 
-        all_blocks = day_blocks + recurring_blocks
+        # Get blocked times for this day and recurring blocks in one query,
+        # date-specific blocks first
+        all_blocks = calendar_block_rows(
+            db.or_(
+                db.and_(BlockedTime.date == current_date, BlockedTime.is_recurring_weekly == False),
+                db.and_(BlockedTime.is_recurring_weekly == True, BlockedTime.recurring_day_of_week == day_of_week)
+            ),
+            order_by=(BlockedTime.is_recurring_weekly, BlockedTime.id)
+        )
 
         # Check if day is fully blocked
         is_fully_blocked = any(b.is_all_day for b in all_blocks)
 
-        # Map bookings and blocks to time slots
-        for slot in time_slots:
-            slot_time = slot['time']
-
-            # Check for bookings that cover this slot
-            for booking in day_bookings:
-                if booking.booking_time <= slot_time < booking.end_time:
-                    # Create CSS-safe category slug
-                    if booking.service.category:
-                        cat_name = booking.service.category.name.lower()
-                        if 'ear' in cat_name:
-                            category_slug = 'ears'
-                        elif 'nose' in cat_name or 'nostril' in cat_name:
-                            category_slug = 'nose'
-                        elif 'consult' in cat_name:
-                            category_slug = 'consultation'
-                        elif 'jewel' in cat_name:
-                            category_slug = 'service'
-                        elif 'under' in cat_name or '16' in cat_name:
-                            category_slug = 'under16'
-                        elif 'body' in cat_name:
-                            category_slug = 'body'
-                        elif 'lip' in cat_name:
-                            category_slug = 'lips'
-                        elif 'face' in cat_name or 'facial' in cat_name:
-                            category_slug = 'face'
-                        else:
-                            category_slug = 'other'
-                    else:
-                        category_slug = 'other'
-                    has_notes = booking.customer_email and booking.customer_email.lower().strip() in emails_with_notes
-                    slot['booking'] = {
-                        'id': booking.id,
-                        'time': booking.booking_time,
-                        'end_time': booking.end_time,
-                        'customer': booking.customer_name,
-                        'email': booking.customer_email,
-                        'service': booking.service.name,
-                        'status': booking.status,
-                        'category': category_slug,
-                        'has_notes': has_notes
-                    }
-                    break
-
-            # Check for blocks that cover this slot
-            if not slot['booking']:
-                for block in all_blocks:
-                    if block.is_all_day:
-                        slot['blocked'] = {
-                            'reason': block.reason,
-                            'is_all_day': True,
-                            'is_recurring': block.is_recurring_weekly,
-                            'start_time': 'All',
-                            'end_time': 'Day'
-                        }
-                        break
-                    elif block.start_time and block.end_time:
-                        if block.start_time <= slot_time < block.end_time:
-                            slot['blocked'] = {
-                                'reason': block.reason,
-                                'is_all_day': False,
-                                'is_recurring': block.is_recurring_weekly,
-                                'start_time': block.start_time,
-                                'end_time': block.end_time
-                            }
-                            break
+        # Map bookings and blocks to time slots. Each one is painted onto the slots it
+        # covers, latest first, so the earliest matching booking/block wins a slot.
+        day_start = start_hour * 60
+        slot_count = len(time_slots)
+        slot_bookings = [None] * slot_count
+        slot_blocks = [None] * slot_count
+
+        for booking in reversed(day_bookings):
+            # Create CSS-safe category slug
+            category_slug = get_category_slug(booking.category_name) if booking.category_name else 'other'
+            booking_data = {
+                'id': booking.id,
+                'time': booking.booking_time,
+                'end_time': booking.end_time,
+                'start_mins': booking.booking_time_min,
+                'duration_mins': booking.end_time_min - booking.booking_time_min,
+                'customer': booking.customer_name,
+                'email': booking.customer_email,
+                'service': booking.service_name,
+                'status': booking.status,
+                'category': category_slug,
+                'has_notes': notes_flags[booking.id]
+            }
+            for i in slot_range(booking.booking_time_min, booking.end_time_min, day_start, slot_count):
+                slot_bookings[i] = booking_data
+
+        for block in reversed(all_blocks):
+            if block.is_all_day:
+                block_data = {
+                    'reason': block.reason,
+                    'is_all_day': True,
+                    'is_recurring': block.is_recurring_weekly,
+                    'start_time': 'All',
+                    'end_time': 'Day'
+                }
+                covered = range(slot_count)
+            elif block.start_time and block.end_time:
+                block_data = {
+                    'reason': block.reason,
+                    'is_all_day': False,
+                    'is_recurring': block.is_recurring_weekly,
+                    'start_time': block.start_time,
+                    'end_time': block.end_time,
+                    'duration_mins': block.end_time_min - block.start_time_min
+                }
+                covered = slot_range(block.start_time_min, block.end_time_min, day_start, slot_count)
+            else:
+                continue
+            for i in covered:
+                slot_blocks[i] = block_data
+
+        for slot, booking_data, block_data in zip(time_slots, slot_bookings, slot_blocks):
+            slot['booking'] = booking_data
+            # Blocks only show where there is no booking
+            if not booking_data:
+                slot['blocked'] = block_data
 
         day_data = {
             'is_fully_blocked': is_fully_blocked
@@ -1028,7 +1531,7 @@ def admin_calendar():
                              next_date=next_date.isoformat(),
                              title=title,
                              days_of_week=days_of_week,
-                             today=date.today(),
+                             today=today,
                              time_slots=time_slots,
                              day_data=day_data)
 
@@ -1068,7 +1571,7 @@ def admin_calendar():
     end_hour = 21   # Default end (9pm)
 
     # Try to get availability to determine hours
-    all_availabilities = Availability.query.filter_by(is_active=True).all()
+    all_availabilities = [window for windows in get_active_availability().values() for window in windows]
     if all_availabilities:
         earliest = min(int(a.start_time.split(':')[0]) for a in all_availabilities)
         latest = max(int(a.end_time.split(':')[0]) for a in all_availabilities)
@@ -1077,100 +1580,90 @@ def admin_calendar():
 
     hours = list(range(start_hour, end_hour))
 
+    # Fetch bookings and blocks for the whole range up front, grouped by day
+    bookings_by_date = defaultdict(list)
+    range_bookings = calendar_booking_rows(Booking.booking_date.between(start_date, end_date))
+    for booking in range_bookings:
+        bookings_by_date[booking.booking_date].append(booking)
+    notes_flags = client_notes_flags(range_bookings)
+
+    # Date-specific blocks in the range and all recurring blocks in one query
+    blocks_by_date = defaultdict(list)
+    recurring_by_day = defaultdict(list)
+    range_blocks = calendar_block_rows(
+        db.or_(
+            db.and_(BlockedTime.date.between(start_date, end_date), BlockedTime.is_recurring_weekly == False),
+            BlockedTime.is_recurring_weekly == True
+        ),
+        order_by=(BlockedTime.is_recurring_weekly, BlockedTime.date, BlockedTime.start_time, BlockedTime.id)
+    )
+    for block in range_blocks:
+        if block.is_recurring_weekly:
+            recurring_by_day[block.recurring_day_of_week].append(block)
+        else:
+            blocks_by_date[block.date].append(block)
+
     # Build calendar data for week/month views
     calendar_data = []
     week_days = []  # For visual week view
     current = start_date
 
+    current_month = current_date.month
     while current <= end_date:
-        day_name_full = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'][current.weekday()]
         day_data = {
             'date': current,
-            'day_name': day_name_full,
-            'is_today': current == date.today(),
-            'is_current_month': current.month == current_date.month,
+            'day_name': days_of_week[current.weekday()],
+            'is_today': current == today,
+            'is_current_month': current.month == current_month,
             'bookings': [],
             'blocked_times': [],
             'is_fully_blocked': False
         }
 
-        # Get bookings for this day (confirmed and no-show, exclude cancelled)
-        day_bookings = Booking.query.filter(
-            Booking.booking_date == current,
-            Booking.status.in_(['confirmed', 'no_show', 'completed'])
-        ).order_by(Booking.booking_time).all()
-
-        for booking in day_bookings:
+        # Bookings for this day (confirmed and no-show, exclude cancelled)
+        for booking in bookings_by_date[current]:
             # Create CSS-safe category slug from category name
-            if booking.service.category:
-                cat_name = booking.service.category.name.lower()
-                # Map common category names to color slugs
-                if 'ear' in cat_name:
-                    category_slug = 'ears'
-                elif 'nose' in cat_name or 'nostril' in cat_name:
-                    category_slug = 'nose'
-                elif 'consult' in cat_name:
-                    category_slug = 'consultation'
-                elif 'jewel' in cat_name:
-                    category_slug = 'service'
-                elif 'under' in cat_name or '16' in cat_name:
-                    category_slug = 'under16'
-                elif 'body' in cat_name:
-                    category_slug = 'body'
-                elif 'lip' in cat_name:
-                    category_slug = 'lips'
-                elif 'face' in cat_name or 'facial' in cat_name:
-                    category_slug = 'face'
-                else:
-                    category_slug = 'other'
-            else:
-                category_slug = 'other'
-            has_notes = booking.customer_email and booking.customer_email.lower().strip() in emails_with_notes
+            category_slug = get_category_slug(booking.category_name) if booking.category_name else 'other'
             day_data['bookings'].append({
                 'id': booking.id,
                 'time': booking.booking_time,
                 'end_time': booking.end_time,
+                'start_mins': booking.booking_time_min,
+                'duration_mins': booking.end_time_min - booking.booking_time_min,
                 'customer': booking.customer_name,
                 'email': booking.customer_email,
-                'service': booking.service.name,
+                'service': booking.service_name,
                 'service_id': booking.service_id,
                 'status': booking.status,
                 'category': category_slug,
-                'has_notes': has_notes,
-                'price': booking.service.price if booking.service else 0
+                'has_notes': notes_flags[booking.id],
+                'price': booking.service_price
             })
 
-        # Get blocked times for this day
-        day_blocks = BlockedTime.query.filter_by(
-            date=current,
-            is_recurring_weekly=False
-        ).order_by(BlockedTime.start_time).all()
-
-        for block in day_blocks:
+        # Blocked times for this day
+        for block in blocks_by_date[current]:
             if block.is_all_day:
                 day_data['is_fully_blocked'] = True
             day_data['blocked_times'].append({
                 'id': block.id,
                 'start_time': block.start_time,
                 'end_time': block.end_time,
+                'start_mins': block.start_time_min,
+                'duration_mins': block_duration(block),
                 'reason': block.reason,
                 'is_all_day': block.is_all_day
             })
 
         # Check for recurring blocks
-        day_of_week = current.weekday()
-        recurring_blocks = BlockedTime.query.filter_by(
-            is_recurring_weekly=True,
-            recurring_day_of_week=day_of_week
-        ).all()
-
-        for block in recurring_blocks:
+        for block in recurring_by_day[current.weekday()]:
             if block.is_all_day:
                 day_data['is_fully_blocked'] = True
             day_data['blocked_times'].append({
                 'id': block.id,
                 'start_time': block.start_time,
                 'end_time': block.end_time,
+                'start_mins': block.start_time_min,
+                'duration_mins': block_duration(block),
                 'reason': block.reason,
                 'is_all_day': block.is_all_day,
                 'is_recurring': True
@@ -1192,7 +1685,7 @@ def admin_calendar():
                          next_date=next_date.isoformat(),
                          title=title,
                          days_of_week=days_of_week,
-                         today=date.today())
+                         today=today)
 
 
 # ==================== ADMIN: BOOKINGS ====================
@@ -1203,8 +1696,16 @@ def admin_bookings():
     # Auto-complete past appointments first
     auto_complete_past_appointments()
 
-    bookings = Booking.query.order_by(Booking.booking_date.desc(), Booking.booking_time.desc()).all()
-    return render_template('admin_bookings.html', bookings=bookings)
+    page = request.args.get('page', 1, type=int)
+    per_page = 50
+
+    # One page of bookings at a time, with each booking's service in the same query
+    pagination = Booking.query.options(*listing_load_options(joinedload(Booking.service))).order_by(
+        Booking.booking_date.desc(), Booking.booking_time.desc()
+    ).paginate(page=page, per_page=per_page, error_out=False)
+    bookings = pagination.items
+
+    return render_template('admin_bookings.html', bookings=bookings, pagination=pagination)
 
 
 @app.route('/admin/booking/add', methods=['GET', 'POST'])
@@ -1219,12 +1720,7 @@ def add_booking():
         booking_time = request.form['booking_time']
 
         # Calculate end time based on service duration
-        start_parts = booking_time.split(':')
-        start_minutes = int(start_parts[0]) * 60 + int(start_parts[1])
-        end_minutes = start_minutes + service.duration_minutes
-        end_hour = end_minutes // 60
-        end_minute = end_minutes % 60
-        end_time = f"{end_hour:02d}:{end_minute:02d}"
+        end_time = minutes_to_time(time_to_minutes(booking_time) + service.duration_minutes)
 
         booking = Booking(
             service_id=service_id,
@@ -1257,10 +1753,10 @@ def add_booking():
     # GET request - show form
     booking_date = request.args.get('date', date.today().isoformat())
     booking_time = request.args.get('time', '09:00')
-    services = Service.query.filter_by(is_active=True).order_by(Service.name).all()
+    services = sorted(get_active_services(), key=lambda s: s.name)
 
     # Group services by category
-    categories = Category.query.filter_by(is_active=True).order_by(Category.display_order).all()
+    categories = get_active_categories()
 
     return render_template('add_booking.html',
                          booking_date=booking_date,
@@ -1275,6 +1771,7 @@ def cancel_booking(booking_id):
     booking = Booking.query.get_or_404(booking_id)
     booking.status = 'cancelled'
     db.session.commit()
+    invalidate_customer_dashboard(booking.user_id)
 
     # Log the activity
     admin_name = session.get('admin_name', 'Admin')
@@ -1286,14 +1783,8 @@ def cancel_booking(booking_id):
         client_email=booking.customer_email
     )
 
-    print("\n" + "=" * 50)
-    print("BOOKING CANCELLED")
-    print("=" * 50)
-    print(f"Booking ID: {booking.id}")
-    print(f"Customer: {booking.customer_name}")
-    print(f"Date: {booking.booking_date}")
-    print(f"Time: {booking.booking_time}")
-    print("=" * 50 + "\n")
+    app.logger.debug("Booking %s cancelled: %s on %s at %s",
+                     booking.id, booking.customer_name, booking.booking_date, booking.booking_time)
 
     flash('Booking cancelled successfully!', 'success')
 
@@ -1310,6 +1801,7 @@ def mark_no_show(booking_id):
     booking.status = 'no_show'
     booking.no_show_at = datetime.now()
     db.session.commit()
+    invalidate_customer_dashboard(booking.user_id)
 
     # Log the activity
     admin_name = session.get('admin_name', 'Admin')
@@ -1321,14 +1813,8 @@ def mark_no_show(booking_id):
         client_email=booking.customer_email
     )
 
-    print("\n" + "=" * 50)
-    print("BOOKING MARKED AS NO-SHOW")
-    print("=" * 50)
-    print(f"Booking ID: {booking.id}")
-    print(f"Customer: {booking.customer_name}")
-    print(f"Date: {booking.booking_date}")
-    print(f"Time: {booking.booking_time}")
-    print("=" * 50 + "\n")
+    app.logger.debug("Booking %s marked as no-show: %s on %s at %s",
+                     booking.id, booking.customer_name, booking.booking_date, booking.booking_time)
 
     flash('Booking marked as no-show.', 'warning')
 
@@ -1345,6 +1831,7 @@ def undo_no_show(booking_id):
     booking.status = 'confirmed'
     booking.no_show_at = None
     db.session.commit()
+    invalidate_customer_dashboard(booking.user_id)
 
     flash('No-show status removed. Booking is now confirmed.', 'success')
 
@@ -1360,6 +1847,7 @@ def mark_complete(booking_id):
     booking = Booking.query.get_or_404(booking_id)
     booking.status = 'completed'
     db.session.commit()
+    invalidate_customer_dashboard(booking.user_id)
 
     # Log the activity
     admin_name = session.get('admin_name', 'Admin')
@@ -1392,8 +1880,8 @@ def extend_booking(booking_id):
         return redirect(url_for('move_booking', booking_id=booking_id))
 
     # Calculate current duration
-    current_start_mins = time_to_minutes(booking.booking_time)
-    current_end_mins = time_to_minutes(booking.end_time)
+    current_start_mins = booking.booking_time_min
+    current_end_mins = booking.end_time_min
     current_duration = current_end_mins - current_start_mins
 
     # Calculate new duration
@@ -1415,16 +1903,17 @@ def extend_booking(booking_id):
 
     # Check for conflicts with other bookings (only if extending)
     if extend_minutes > 0:
-        existing_booking = Booking.query.filter(
+        # Only the clashing start time is needed for the message, so don't load the row
+        conflict_time = db.session.query(Booking.booking_time).filter(
             Booking.id != booking.id,
             Booking.booking_date == booking.booking_date,
-            Booking.status.in_(['confirmed', 'completed']),
-            Booking.booking_time < new_end_time,
-            Booking.end_time > booking.end_time
-        ).first()
+            Booking.status.in_(CONFLICT_STATUSES),
+            Booking.booking_time_min < new_end_mins,
+            Booking.end_time_min > current_end_mins
+        ).limit(1).scalar()
 
-        if existing_booking:
-            flash(f'Cannot extend - conflicts with booking at {existing_booking.booking_time}.', 'error')
+        if conflict_time:
+            flash(f'Cannot extend - conflicts with booking at {conflict_time}.', 'error')
             return redirect(url_for('move_booking', booking_id=booking_id))
 
         # Check for blocked times
@@ -1436,11 +1925,11 @@ def extend_booking(booking_id):
     old_end_time = booking.end_time
     booking.end_time = new_end_time
     db.session.commit()
+    invalidate_customer_dashboard(booking.user_id)
 
     action = "Extended" if extend_minutes > 0 else "Reduced"
-    print(f"\n[BOOKING {action.upper()}] #{booking.id}: {booking.customer_name}")
-    print(f"  Duration changed by {extend_minutes} minutes")
-    print(f"  New end time: {new_end_time} (was {old_end_time})")
+    app.logger.debug("Booking %s %s by %s minutes: %s, end time %s (was %s)",
+                     booking.id, action.lower(), extend_minutes, booking.customer_name, new_end_time, old_end_time)
 
     flash(f'Appointment {action.lower()} by {abs(extend_minutes)} minutes. New end time: {new_end_time}', 'success')
     return redirect(url_for('move_booking', booking_id=booking_id))
@@ -1469,17 +1958,17 @@ def move_booking(booking_id):
         end_mins = start_mins + duration
         new_end_time = minutes_to_time(end_mins)
 
-        # Check for conflicts
-        existing_booking = Booking.query.filter(
+        # Check for conflicts (existence only, no row is loaded)
+        conflict_exists = db.session.query(db.select(Booking.id).filter(
             Booking.id != booking.id,
             Booking.booking_date == new_date,
-            Booking.status.in_(['confirmed', 'completed']),
-            ((Booking.booking_time <= new_time) & (Booking.end_time > new_time)) |
-            ((Booking.booking_time < new_end_time) & (Booking.end_time >= new_end_time)) |
-            ((Booking.booking_time >= new_time) & (Booking.end_time <= new_end_time))
-        ).first()
+            Booking.status.in_(CONFLICT_STATUSES),
+            # Slots overlap if each starts before the other ends
+            Booking.booking_time_min < end_mins,
+            Booking.end_time_min > start_mins
+        ).exists()).scalar()
 
-        if existing_booking:
+        if conflict_exists:
             flash('This time slot conflicts with another booking. Please choose a different time.', 'error')
             return redirect(url_for('move_booking', booking_id=booking_id))
 
@@ -1497,16 +1986,11 @@ def move_booking(booking_id):
         booking.booking_time = new_time
         booking.end_time = new_end_time
         db.session.commit()
+        invalidate_customer_dashboard(booking.user_id)
 
-        print("\n" + "=" * 50)
-        print("BOOKING MOVED/RESCHEDULED")
-        print("=" * 50)
-        print(f"Booking ID: {booking.id}")
-        print(f"Customer: {booking.customer_name}")
-        print(f"Service: {service.name if service else 'Unknown'}")
-        print(f"From: {old_date} at {old_time}")
-        print(f"To: {new_date} at {new_time}")
-        print("=" * 50 + "\n")
+        app.logger.debug("Booking %s moved: %s (%s) from %s at %s to %s at %s",
+                         booking.id, booking.customer_name, service.name if service else 'Unknown',
+                         old_date, old_time, new_date, new_time)
 
         flash(f'Booking moved to {new_date.strftime("%A, %d %B %Y")} at {new_time}', 'success')
         return redirect(url_for('admin_calendar', view='day', date=new_date.isoformat()))
@@ -1527,10 +2011,10 @@ def get_available_slots_for_move():
     duration = request.args.get('duration', 30, type=int)
     exclude_booking_id = request.args.get('exclude_booking', type=int)
 
-    print(f"[AVAILABLE-SLOTS] Request: date={date_str}, duration={duration}, exclude={exclude_booking_id}")
+    app.logger.debug("[AVAILABLE-SLOTS] Request: date=%s, duration=%s, exclude=%s", date_str, duration, exclude_booking_id)
 
     if not date_str:
-        print("[AVAILABLE-SLOTS] Error: No date provided")
+        app.logger.debug("[AVAILABLE-SLOTS] Error: No date provided")
         return jsonify({'error': 'Date required', 'slots': []})
 
     try:
@@ -1540,72 +2024,49 @@ def get_available_slots_for_move():
 
     # Check if the entire day is blocked
     if is_day_fully_blocked(booking_date):
-        print(f"[AVAILABLE-SLOTS] Day {booking_date} is fully blocked")
+        app.logger.debug("[AVAILABLE-SLOTS] Day %s is fully blocked", booking_date)
         return jsonify({'slots': [], 'message': 'Day is fully blocked'})
 
     day_of_week = booking_date.weekday()
-    print(f"[AVAILABLE-SLOTS] Day of week: {day_of_week} ({['Mon','Tue','Wed','Thu','Fri','Sat','Sun'][day_of_week]})")
 
     # Get availability for this day
-    availability = Availability.query.filter_by(
-        day_of_week=day_of_week,
-        is_active=True
-    ).all()
+    availability = get_active_availability()[day_of_week]
 
-    print(f"[AVAILABLE-SLOTS] Found {len(availability)} availability records for this day")
+    app.logger.debug("[AVAILABLE-SLOTS] Found %s availability records for day %s", len(availability), day_of_week)
 
     if not availability:
-        print(f"[AVAILABLE-SLOTS] No availability for day {day_of_week}")
+        app.logger.debug("[AVAILABLE-SLOTS] No availability for day %s", day_of_week)
         return jsonify({'slots': [], 'message': 'No availability set for this day'})
 
+    # Load blocked times and conflicting bookings (excluding the one being moved) once
+    blocked_ranges = [
+        (block.start_time_min, block.end_time_min) for block in get_day_blocks(booking_date)
+        if block.start_time_min is not None and block.end_time_min is not None
+    ]
+    query = db.select(Booking.booking_time_min, Booking.end_time_min).filter(
+        Booking.booking_date == booking_date,
+        Booking.status.in_(CONFLICT_STATUSES)
+    )
+    if exclude_booking_id:
+        query = query.filter(Booking.id != exclude_booking_id)
+    booking_ranges = [tuple(row) for row in db.session.execute(query)]
+
+    taken = IntervalIndex(blocked_ranges + booking_ranges)
     slots = []
 
     for avail in availability:
-        start_mins = time_to_minutes(avail.start_time)
-        end_mins = time_to_minutes(avail.end_time)
-
         # Generate slots at 30-minute intervals
-        current = start_mins
-        while current + duration <= end_mins:
-            slot_start = minutes_to_time(current)
-            slot_end = minutes_to_time(current + duration)
-
-            # Check if this slot is blocked
-            if is_time_blocked(booking_date, slot_start, slot_end):
-                current += 30
-                continue
-
-            # Check for conflicting bookings (excluding the one being moved)
-            query = Booking.query.filter(
-                Booking.booking_date == booking_date,
-                Booking.status.in_(['confirmed', 'completed'])
-            )
-            if exclude_booking_id:
-                query = query.filter(Booking.id != exclude_booking_id)
-            conflict = query.all()
-
-            slot_available = True
-            slot_start_mins = time_to_minutes(slot_start)
-            slot_end_mins = time_to_minutes(slot_end)
-
-            for booking in conflict:
-                existing_start = time_to_minutes(booking.booking_time)
-                existing_end = time_to_minutes(booking.end_time)
-
-                # Check for overlap
-                if slot_start_mins < existing_end and slot_end_mins > existing_start:
-                    slot_available = False
-                    break
+        for slot_start in _candidate_starts(time_to_minutes(avail.start_time), time_to_minutes(avail.end_time), duration):
+            slot_end = slot_start + duration
 
-            if slot_available:
+            # Check for overlap with blocked times and other bookings
+            if not taken.overlaps(slot_start, slot_end):
                 slots.append({
-                    'start': slot_start,
-                    'end': slot_end
+                    'start': minutes_to_time(slot_start),
+                    'end': minutes_to_time(slot_end)
                 })
 
-            current += 30
-
-    print(f"[AVAILABLE-SLOTS] Returning {len(slots)} slots")
+    app.logger.debug("[AVAILABLE-SLOTS] Returning %s slots", len(slots))
     return jsonify({'slots': slots})
 
 
@@ -1614,7 +2075,7 @@ def get_available_slots_for_move():
 @app.route('/admin/import', methods=['GET'])
 @login_required
 def admin_import():
-    services = Service.query.filter_by(is_active=True).all()
+    services = get_active_services()
     return render_template('admin_import.html', services=services)
 
 
@@ -1636,24 +2097,21 @@ def import_preview():
         return redirect(url_for('admin_import'))
 
     try:
-        file_content = file.read()
-        rows = parse_csv_file(file_content)
-
-        if not rows:
-            flash('CSV file is empty or has no data rows', 'error')
-            return redirect(url_for('admin_import'))
+        # Service lookup for validation
+        services = get_active_services()
+        services_by_name = get_services_by_name()
 
-        # Build services dictionary for validation
-        services = Service.query.filter_by(is_active=True).all()
-        services_dict = {s.name: s for s in services}
+        # Load existing bookings and blocks for every date in the file up front
+        encoding, dates = scan_csv_dates(file.stream)
+        taken_by_date = load_taken_ranges(dates)
 
-        # Validate all rows
+        # Validate rows as they are parsed
         preview_data = []
         all_errors = []
-        valid_count = 0
+        pending_rows = []
 
-        for i, row in enumerate(rows, start=2):  # Start at 2 (row 1 is header)
-            errors, validated = validate_csv_row(row, i, services_dict)
+        for i, row in enumerate(parse_csv_file(file.stream, encoding), start=2):  # Start at 2 (row 1 is header)
+            errors, validated = validate_csv_row(row, i, services_by_name, taken_by_date)
 
             if errors:
                 all_errors.extend(errors)
@@ -1664,7 +2122,16 @@ def import_preview():
                     'errors': errors
                 })
             else:
-                valid_count += 1
+                pending_rows.append({
+                    'row_num': i,
+                    'service_id': validated['service_id'],
+                    'customer_name': validated['customer_name'],
+                    'customer_email': validated['customer_email'],
+                    'customer_phone': validated['customer_phone'],
+                    'booking_date': validated['booking_date'].isoformat(),
+                    'booking_time': validated['booking_time'],
+                    'end_time': validated['end_time']
+                })
                 preview_data.append({
                     'row_num': i,
                     'data': row,
@@ -1672,15 +2139,21 @@ def import_preview():
                     'validated': validated
                 })
 
-        # Store file content in session for later import
-        session['import_file_content'] = file_content.decode('utf-8-sig', errors='replace')
+        if not preview_data:
+            flash('CSV file is empty or has no data rows', 'error')
+            return redirect(url_for('admin_import'))
+
+        # Keep the validated rows server-side so confirm doesn't re-parse the file
+        discard_pending_import(session.pop('import_token', None))
+        session['import_token'] = save_pending_import(pending_rows, all_errors)
+        valid_count = len(pending_rows)
 
         return render_template('admin_import.html',
                              services=services,
                              preview_data=preview_data,
                              valid_count=valid_count,
-                             error_count=len(rows) - valid_count,
-                             total_count=len(rows),
+                             error_count=len(preview_data) - valid_count,
+                             total_count=len(preview_data),
                              show_preview=True)
 
     except Exception as e:
@@ -1691,55 +2164,63 @@ def import_preview():
 @app.route('/admin/import/confirm', methods=['POST'])
 @login_required
 def import_confirm():
-    file_content = session.get('import_file_content')
+    token = session.get('import_token')
+    pending = load_pending_import(token)
 
-    if not file_content:
+    if not pending:
         flash('No file to import. Please upload a CSV file first.', 'error')
         return redirect(url_for('admin_import'))
 
+    started = time.perf_counter()
     try:
-        rows = parse_csv_file(file_content.encode('utf-8'))
-
-        # Build services dictionary
-        services = Service.query.filter_by(is_active=True).all()
-        services_dict = {s.name: s for s in services}
-
-        # Import valid rows
-        imported_count = 0
-        errors = []
-
-        for i, row in enumerate(rows, start=2):
-            row_errors, validated = validate_csv_row(row, i, services_dict)
-
-            if row_errors:
-                errors.extend(row_errors)
+        services = get_active_services()
+        errors = list(pending['errors'])
+
+        # Rows were validated at preview; only re-check them against bookings
+        # and blocks added since then
+        for row in pending['rows']:
+            row['booking_date'] = date.fromisoformat(row['booking_date'])
+        taken_by_date = load_taken_ranges({row['booking_date'] for row in pending['rows']})
+
+        rows = []
+        for row in pending['rows']:
+            start_mins = time_to_minutes(row['booking_time'])
+            end_mins = time_to_minutes(row['end_time'])
+            taken = taken_by_date.setdefault(row['booking_date'], IntervalIndex())
+            if taken.overlaps(start_mins, end_mins):
+                errors.append(f"Row {row['row_num']}: Time slot {row['booking_time']} on {row['booking_date']} conflicts with existing booking")
                 continue
+            taken.add(start_mins, end_mins)
+
+            # Bulk inserts skip the model's validators, so set the minute columns here
+            rows.append({
+                'service_id': row['service_id'],
+                'customer_name': row['customer_name'],
+                'customer_email': row['customer_email'],
+                'customer_phone': row['customer_phone'],
+                'booking_date': row['booking_date'],
+                'booking_time': row['booking_time'],
+                'end_time': row['end_time'],
+                'booking_time_min': start_mins,
+                'end_time_min': end_mins,
+                'customer_email_normalized': normalize_email(row['customer_email']),
+                'customer_phone_normalized': normalize_phone(row['customer_phone']),
+                'status': 'confirmed'
+            })
 
-            # Create booking
-            booking = Booking(
-                service_id=validated['service'].id,
-                customer_name=validated['customer_name'],
-                customer_email=validated['customer_email'],
-                customer_phone=validated['customer_phone'],
-                booking_date=validated['booking_date'],
-                booking_time=validated['booking_time'],
-                end_time=validated['end_time'],
-                status='confirmed'
-            )
-
-            db.session.add(booking)
-            imported_count += 1
-
-            # Print notification
-            print(f"\n[IMPORTED] Booking: {validated['customer_name']} - {validated['booking_date']} {validated['booking_time']}")
-
+        imported_count = len(rows)
+        if rows:
+            db.session.execute(db.insert(Booking), rows)
         db.session.commit()
 
-        # Clear session data
-        session.pop('import_file_content', None)
+        app.logger.info("[IMPORT] inserted %d rows in %.2fs (%d errors)",
+                        imported_count, time.perf_counter() - started, len(errors))
+
+        # Clear pending import
+        session.pop('import_token', None)
+        discard_pending_import(token)
 
         # Show results
-        services = Service.query.filter_by(is_active=True).all()
         return render_template('admin_import.html',
                              services=services,
                              import_complete=True,
@@ -1753,47 +2234,61 @@ def import_confirm():
         return redirect(url_for('admin_import'))
 
 
-@app.route('/admin/import/sample.csv')
-@login_required
-def download_sample_csv():
-    # Get service names for sample
-    services = Service.query.filter_by(is_active=True).all()
-    service_name = services[0].name if services else 'Consultation'
+def iter_csv_lines(rows):
+    """Yield each row as an encoded CSV line, reusing one small buffer"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
 
-    # Create sample CSV content
-    output = io.StringIO()
-    writer = csv.writer(output)
 
-    # Header
-    writer.writerow(['customer_name', 'customer_email', 'customer_phone', 'service_name', 'booking_date', 'booking_time'])
+@lru_cache(maxsize=8)
+def build_sample_csv(service_name, today):
+    """Sample import CSV for a service name and day (cached, it only changes daily)"""
+    tomorrow = (today + timedelta(days=1)).strftime('%Y-%m-%d')
+    day_after = (today + timedelta(days=2)).strftime('%Y-%m-%d')
 
-    # Sample data rows
-    tomorrow = (date.today() + timedelta(days=1)).strftime('%Y-%m-%d')
-    day_after = (date.today() + timedelta(days=2)).strftime('%Y-%m-%d')
+    rows = [
+        ['customer_name', 'customer_email', 'customer_phone', 'service_name', 'booking_date', 'booking_time'],
+        ['John Smith', 'john@example.com', '555-123-4567', service_name, tomorrow, '09:00'],
+        ['Jane Doe', 'jane@example.com', '555-987-6543', service_name, tomorrow, '10:30'],
+        ['Bob Wilson', 'bob@example.com', '', service_name, day_after, '14:00'],
+    ]
+    return ''.join(iter_csv_lines(rows))
 
-    writer.writerow(['John Smith', 'john@example.com', '555-123-4567', service_name, tomorrow, '09:00'])
-    writer.writerow(['Jane Doe', 'jane@example.com', '555-987-6543', service_name, tomorrow, '10:30'])
-    writer.writerow(['Bob Wilson', 'bob@example.com', '', service_name, day_after, '14:00'])
 
-    output.seek(0)
+@app.route('/admin/import/sample.csv')
+@login_required
+def download_sample_csv():
+    # Get service names for sample
+    services = get_active_services()
+    service_name = services[0].name if services else 'Consultation'
+    today = date.today()
 
-    return Response(
-        output.getvalue(),
-        mimetype='text/csv',
-        headers={'Content-Disposition': 'attachment; filename=sample_bookings.csv'}
-    )
+    # The content only depends on the service name and the date
+    etag = hashlib.sha1(f'{service_name}|{today.isoformat()}'.encode()).hexdigest()
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(
+            build_sample_csv(service_name, today),
+            mimetype='text/csv',
+            headers={'Content-Disposition': 'attachment; filename=sample_bookings.csv'}
+        )
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.max_age = 3600
+    return response
 
 
 # ==================== ADMIN: CLIENTS ====================
 
-def normalize_phone(phone):
-    """Normalize phone number for comparison (remove spaces, dashes, etc.)"""
-    if not phone:
-        return None
-    # Keep only digits
-    normalized = ''.join(c for c in phone if c.isdigit())
-    # Return None if too short to be valid
-    return normalized if len(normalized) >= 7 else None
+def email_equals(column, email):
+    """Case-insensitive email match that can use the lower(email) indexes"""
+    return db.func.lower(column) == email.lower()
 
 
 def group_clients_by_email_or_phone(bookings):
@@ -1801,85 +2296,77 @@ def group_clients_by_email_or_phone(bookings):
     Group bookings into client records by matching email OR phone.
     If either matches, the bookings belong to the same client.
     """
-    # Maps to track which client group each email/phone belongs to
-    email_to_group = {}
-    phone_to_group = {}
-    groups = {}  # group_id -> list of bookings
-    next_group_id = 0
-
-    for booking in bookings:
-        email = booking.customer_email.lower().strip() if booking.customer_email else None
-        phone = normalize_phone(booking.customer_phone)
-
-        # Find existing group for this email or phone
-        group_id = None
-
-        if email and email in email_to_group:
-            group_id = email_to_group[email]
-        if phone and phone in phone_to_group:
-            found_group = phone_to_group[phone]
-            if group_id is None:
-                group_id = found_group
-            elif group_id != found_group:
-                # Merge the two groups - phone matches a different group than email
-                # Move all bookings from found_group to group_id
-                groups[group_id].extend(groups[found_group])
-                # Update all email/phone mappings that pointed to found_group
-                for e, g in list(email_to_group.items()):
-                    if g == found_group:
-                        email_to_group[e] = group_id
-                for p, g in list(phone_to_group.items()):
-                    if g == found_group:
-                        phone_to_group[p] = group_id
-                del groups[found_group]
-
-        # Create new group if needed
-        if group_id is None:
-            group_id = next_group_id
-            next_group_id += 1
-            groups[group_id] = []
-
-        # Add booking to group
-        groups[group_id].append(booking)
-
-        # Update mappings
-        if email:
-            email_to_group[email] = group_id
-        if phone:
-            phone_to_group[phone] = group_id
-
-    return groups
+    # Union-find over email/phone keys: bookings sharing either end up with the same root
+    parent = {}
+    rank = {}
+
+    def find(key):
+        root = key
+        while parent[root] != root:
+            root = parent[root]
+        # Path compression
+        while parent[key] != root:
+            parent[key], key = root, parent[key]
+        return root
+
+    def union(a, b):
+        a, b = find(a), find(b)
+        if a == b:
+            return
+        if rank[a] < rank[b]:
+            a, b = b, a
+        parent[b] = a
+        if rank[a] == rank[b]:
+            rank[a] += 1
+
+    booking_keys = []
+    for i, booking in enumerate(bookings):
+        # Normalized when the booking was written
+        email = booking.customer_email_normalized
+        phone = booking.customer_phone_normalized
+
+        keys = [f'e:{email}' if email else None, f'p:{phone}' if phone else None]
+        keys = [k for k in keys if k] or [f'b:{i}']  # No contact details: the booking is its own client
+        for key in keys:
+            if key not in parent:
+                parent[key] = key
+                rank[key] = 0
+        if len(keys) == 2:
+            union(*keys)
+        booking_keys.append(keys[0])
+
+    # Collect bookings under their root, numbering groups by first appearance
+    by_root = defaultdict(list)
+    for booking, key in zip(bookings, booking_keys):
+        by_root[find(key)].append(booking)
+
+    return dict(enumerate(by_root.values()))
 
 
 @app.route('/admin/clients/send-followup/<path:client_email>', methods=['POST'])
 @login_required
 def send_manual_followup(client_email):
     """Manually send a 6-week follow-up email to a client"""
-    from email_service import send_followup_email
+    from email_service import send_followup_email, email_configured
 
-    # Find the most recent completed booking for this client
+    # Most recent completed booking for this client, falling back to their most
+    # recent booking of any status (one query)
     booking = Booking.query.filter(
-        Booking.customer_email.ilike(client_email),
-        Booking.status == 'completed'
-    ).order_by(Booking.booking_date.desc()).first()
+        Booking.contact_filter(email=client_email)
+    ).order_by((Booking.status == 'completed').desc(), Booking.booking_date.desc()).first()
 
     if not booking:
-        # If no completed booking, try to find any booking to get client name
-        booking = Booking.query.filter(
-            Booking.customer_email.ilike(client_email)
-        ).order_by(Booking.booking_date.desc()).first()
-
-        if not booking:
-            flash('No bookings found for this client.', 'error')
-            return redirect(url_for('admin_clients'))
-
-    # Send the follow-up email
-    success = send_followup_email(booking)
+        flash('No bookings found for this client.', 'error')
+        return redirect(url_for('admin_clients'))
 
-    if success:
-        flash(f'6-week follow-up email sent to {client_email}', 'success')
-    else:
+    # Catch a disabled or unconfigured provider here, since the background send can't report back
+    if not email_configured():
         flash('Failed to send email. Please check email settings.', 'error')
+        return redirect(url_for('client_profile', identifier=client_email))
+
+    # Send the follow-up email in the background
+    queue_booking_email(send_followup_email, booking.id)
+    flash(f'6-week follow-up email is being sent to {client_email}', 'success')
 
     return redirect(url_for('client_profile', identifier=client_email))
 
@@ -1888,10 +2375,15 @@ def send_manual_followup(client_email):
 @login_required
 def toggle_day_after_block(booking_id):
     """Toggle whether a booking should receive the 24-hour follow-up email"""
-    booking = Booking.query.get_or_404(booking_id)
-
-    # Toggle the block status
-    booking.day_after_blocked = not booking.day_after_blocked
+    # Toggle the block status in one UPDATE, reading back what the redirect needs
+    booking = db.session.execute(
+        db.update(Booking).where(Booking.id == booking_id)
+        .values(day_after_blocked=db.not_(db.func.coalesce(Booking.day_after_blocked, False)))
+        .returning(Booking.day_after_blocked, Booking.booking_date)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if booking is None:
+        abort(404)
     db.session.commit()
 
     if booking.day_after_blocked:
@@ -1997,6 +2489,18 @@ def delete_client_note(note_id):
     return redirect(url_for('client_profile', identifier=client_email))
 
 
+# Notes returned by the calendar modal's notes API (newest first)
+CLIENT_NOTES_API_LIMIT = 50
+
+
+def client_has_alerts(client_email):
+    """Whether any of the client's notes is flagged as an alert (EXISTS, no rows loaded)"""
+    return db.session.execute(db.select(db.select(ClientNote.id).filter(
+        email_equals(ClientNote.client_email, client_email),
+        ClientNote.is_alert == True
+    ).exists())).scalar()
+
+
 @app.route('/admin/client-notes/<client_email>')
 @login_required
 def get_client_notes_api(client_email):
@@ -2004,7 +2508,7 @@ def get_client_notes_api(client_email):
     all_notes = []
 
     # First, get the Client.notes field (Staff Notes from client profile)
-    client = Client.query.filter(Client.email.ilike(client_email)).first()
+    client = Client.query.filter(email_equals(Client.email, client_email)).first()
     if client and client.notes and client.notes.strip():
         all_notes.append({
             'id': 0,
@@ -2014,10 +2518,10 @@ def get_client_notes_api(client_email):
             'is_staff_note': True
         })
 
-    # Then get any ClientNote entries
+    # Then the most recent ClientNote entries
     notes = ClientNote.query.filter(
-        ClientNote.client_email.ilike(client_email)
-    ).order_by(ClientNote.created_at.desc()).all()
+        email_equals(ClientNote.client_email, client_email)
+    ).order_by(ClientNote.created_at.desc()).limit(CLIENT_NOTES_API_LIMIT).all()
 
     for n in notes:
         all_notes.append({
@@ -2030,25 +2534,31 @@ def get_client_notes_api(client_email):
 
     return jsonify({
         'notes': all_notes,
-        'has_alerts': any(n.is_alert for n in notes)
+        'has_alerts': client_has_alerts(client_email)
     })
 
 
+@app.route('/admin/client-notes/<client_email>/alerts')
+@login_required
+def get_client_alerts_api(client_email):
+    """API endpoint for just the alert flag, without loading any notes"""
+    return jsonify({'has_alerts': client_has_alerts(client_email)})
+
+
 @app.route('/admin/clients/profile/<path:identifier>')
 @login_required
 def client_profile(identifier):
     """Client profile page - shows booking history, notes, etc by email"""
-    from models import Client, ClientNote, Booking, Service
     from collections import Counter
 
     # Find client by email
     client = Client.query.filter(
-        Client.email.ilike(identifier)
+        email_equals(Client.email, identifier)
     ).first()
 
     # Get all bookings for this email
     bookings = Booking.query.filter(
-        Booking.customer_email.ilike(identifier)
+        Booking.contact_filter(email=identifier)
     ).order_by(Booking.booking_date.desc()).all()
 
     # Build client info from bookings if no client record
@@ -2087,7 +2597,7 @@ def client_profile(identifier):
 
     # Get client notes
     notes = ClientNote.query.filter(
-        ClientNote.client_email.ilike(identifier)
+        email_equals(ClientNote.client_email, identifier)
     ).order_by(ClientNote.created_at.desc()).all()
 
     return render_template('client_profile.html',
@@ -2101,7 +2611,7 @@ def client_profile(identifier):
 @app.route('/book')
 def booking_page():
     # Get categories with their services
-    categories = Category.query.filter_by(is_active=True).order_by(Category.display_order).all()
+    categories = Category.query.options(*listing_load_options(selectinload(Category.services))).filter_by(is_active=True).order_by(Category.display_order).all()
 
     # Get uncategorized services
     uncategorized = Service.query.filter_by(is_active=True, category_id=None).order_by(Service.display_order).all()
@@ -2121,10 +2631,14 @@ def get_available_slots():
         flash('Service not found', 'error')
         return redirect(url_for('booking_page'))
 
-    booking_date_obj = datetime.strptime(booking_date, '%Y-%m-%d').date()
+    try:
+        booking_date_obj = date.fromisoformat(booking_date)
+    except ValueError:
+        flash('Invalid date', 'error')
+        return redirect(url_for('booking_page'))
 
     # Get categories for template
-    categories = Category.query.filter_by(is_active=True).order_by(Category.display_order).all()
+    categories = Category.query.options(*listing_load_options(selectinload(Category.services))).filter_by(is_active=True).order_by(Category.display_order).all()
     uncategorized = Service.query.filter_by(is_active=True, category_id=None).order_by(Service.display_order).all()
     today = date.today().isoformat()
     max_date = (date.today() + timedelta(days=30)).isoformat()
@@ -2206,17 +2720,18 @@ def confirm_booking():
     if not total_duration:
         total_duration = sum(s.duration_minutes for s in services)
 
-    booking_date_obj = datetime.strptime(booking_date, '%Y-%m-%d').date()
+    try:
+        booking_date_obj = date.fromisoformat(booking_date)
+    except ValueError:
+        flash('Invalid date', 'error')
+        return redirect(url_for('booking_page'))
 
     # Calculate end time based on total duration
     start_mins = time_to_minutes(booking_time)
     end_mins = start_mins + total_duration
     end_time = minutes_to_time(end_mins)
 
-    # Double-check availability before proceeding
-    if not check_slot_available(booking_date_obj, booking_time, end_time):
-        flash('Sorry, this time slot is no longer available. Please choose another time.', 'error')
-        return redirect(url_for('booking_page'))
+    # Availability is checked once, under a lock, when the intake form is submitted
 
     # Build additional services info for multi-service bookings
     additional_services = []
@@ -2251,15 +2766,14 @@ def intake_form():
         flash('Please start a new booking.', 'error')
         return redirect(url_for('booking_page'))
 
-    # Get primary service
-    service = Service.query.get(pending['service_id'])
+    # Get all selected services in one query, then pick out the primary one
+    service_ids = pending.get('service_ids', [pending['service_id']])
+    all_services = Service.query.filter(Service.id.in_({*service_ids, pending['service_id']})).all()
+    service = next((s for s in all_services if s.id == pending['service_id']), None)
     if not service:
         flash('Service not found', 'error')
         return redirect(url_for('booking_page'))
-
-    # Get all selected services for display
-    service_ids = pending.get('service_ids', [pending['service_id']])
-    all_services = Service.query.filter(Service.id.in_(service_ids)).all()
+    all_services = [s for s in all_services if s.id in service_ids]
     total_duration = pending.get('total_duration', service.duration_minutes)
     total_price = sum(s.price or 0 for s in all_services)
 
@@ -2281,6 +2795,16 @@ def intake_form():
         age = today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
         is_minor = age < 18
 
+        booking_date_obj = date.fromisoformat(pending['booking_date'])
+
+        # Final availability check, holding the day's booking lock until commit
+        lock_booking_day(booking_date_obj)
+        if not check_slot_available(booking_date_obj, pending['booking_time'], pending['end_time']):
+            db.session.rollback()
+            flash('Sorry, this time slot is no longer available. Please choose another time.', 'error')
+            session.pop('pending_booking', None)
+            return redirect(url_for('booking_page'))
+
         # Create intake form
         intake = IntakeForm(
             # Personal Info
@@ -2304,16 +2828,6 @@ def intake_form():
         db.session.add(intake)
         db.session.flush()  # Get the ID
 
-        # Now create the booking
-        booking_date_obj = datetime.strptime(pending['booking_date'], '%Y-%m-%d').date()
-
-        # Final availability check
-        if not check_slot_available(booking_date_obj, pending['booking_time'], pending['end_time']):
-            db.session.rollback()
-            flash('Sorry, this time slot is no longer available. Please choose another time.', 'error')
-            session.pop('pending_booking', None)
-            return redirect(url_for('booking_page'))
-
         # Get customer details from the intake form
         customer_name = request.form['full_name']
         customer_email = request.form['email']
@@ -2351,26 +2865,27 @@ def intake_form():
         )
 
         db.session.add(booking)
-        db.session.commit()
 
-        # Create or update Client record for CRM/marketing
+        # Create or update Client record for CRM/marketing in the same transaction,
+        # under a savepoint so a failure here doesn't lose the booking
         try:
-            from models import Client
-            client = Client.find_or_create(
-                email=customer_email,
-                phone=customer_phone,
-                name=customer_name,
-                source='booking'
-            )
-            # Update stats
-            client.total_bookings = (client.total_bookings or 0) + 1
-            client.last_booking_date = booking_date_obj
-            if not client.first_booking_date:
-                client.first_booking_date = booking_date_obj
-            db.session.commit()
+            with db.session.begin_nested():
+                client = Client.find_or_create(
+                    email=customer_email,
+                    phone=customer_phone,
+                    name=customer_name,
+                    source='booking'
+                )
+                # Update stats
+                client.total_bookings = (client.total_bookings or 0) + 1
+                client.last_booking_date = booking_date_obj
+                if not client.first_booking_date:
+                    client.first_booking_date = booking_date_obj
         except Exception as e:
             print(f"[CLIENT] Could not create/update client record: {e}")
 
+        db.session.commit()
+
         # Build service description for log
         if len(all_services) > 1:
             all_service_names = ' + '.join(s.name for s in all_services)
@@ -2386,30 +2901,21 @@ def intake_form():
             client_email=customer_email
         )
 
+        invalidate_customer_dashboard(booking.user_id)
+
         # Clear session
         session.pop('pending_booking', None)
 
-        # Print notification
-        print("\n" + "=" * 50)
-        print("NEW BOOKING RECEIVED!")
-        print("=" * 50)
-        print(f"Booking ID: {booking.id}")
-        print(f"Services: {all_service_names}")
-        print(f"Duration: {total_duration} minutes")
-        print(f"Date: {booking.booking_date}")
-        print(f"Time: {booking.booking_time} - {booking.end_time}")
-        print(f"Customer: {booking.customer_name}")
-        print(f"Email: {booking.customer_email}")
-        if is_minor:
-            print("*** NOTE: Client is a minor ***")
-        print("=" * 50 + "\n")
-
-        # Send confirmation email
-        try:
+        # Log notification
+        app.logger.info("[NEW BOOKING] #%s %s (%s min) on %s at %s-%s for %s <%s>%s",
+                        booking.id, all_service_names, total_duration, booking.booking_date,
+                        booking.booking_time, booking.end_time, booking.customer_name,
+                        booking.customer_email, " - client is a minor" if is_minor else "")
+
+        # Send confirmation email in the background (skipped when turned off in settings)
+        if Settings.get_bool('send_confirmation_email'):
             from email_service import send_confirmation_email
-            send_confirmation_email(booking)
-        except Exception as e:
-            print(f"[EMAIL ERROR] Failed to send confirmation: {e}")
+            queue_booking_email(send_confirmation_email, booking.id)
 
         return render_template('booking_confirmed.html', booking=booking, service=service, all_services=all_services, total_duration=total_duration, total_price=total_price)
 
@@ -2425,15 +2931,23 @@ def admin_intake_forms():
     """View all intake forms"""
     show_unreviewed = request.args.get('unreviewed', '') == '1'
 
-    query = IntakeForm.query
+    page = request.args.get('page', 1, type=int)
+    per_page = 50
+
+    # Only the columns the listing shows, one page at a time
+    query = IntakeForm.query.options(load_only(
+        IntakeForm.id, IntakeForm.full_name, IntakeForm.email, IntakeForm.created_at,
+        IntakeForm.reviewed_by_admin, IntakeForm.is_minor
+    ))
 
     if show_unreviewed:
         query = query.filter_by(reviewed_by_admin=False)
 
-    forms = query.order_by(IntakeForm.created_at.desc()).all()
+    pagination = query.order_by(IntakeForm.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
 
     return render_template('admin_intake_forms.html',
-                         forms=forms,
+                         forms=pagination.items,
+                         pagination=pagination,
                          show_unreviewed=show_unreviewed)
 
 
@@ -2449,9 +2963,13 @@ def view_intake_form(form_id):
 @login_required
 def review_intake_form(form_id):
     """Mark intake form as reviewed"""
-    intake = IntakeForm.query.get_or_404(form_id)
-    intake.reviewed_by_admin = True
-    intake.admin_notes = request.form.get('admin_notes', '')
+    result = db.session.execute(
+        db.update(IntakeForm).where(IntakeForm.id == form_id)
+        .values(reviewed_by_admin=True, admin_notes=request.form.get('admin_notes', ''))
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        abort(404)
     db.session.commit()
     flash('Intake form marked as reviewed.', 'success')
     return redirect(url_for('view_intake_form', form_id=form_id))
@@ -2459,6 +2977,29 @@ def review_intake_form(form_id):
 
 # ==================== ADMIN: SETTINGS ====================
 
+# Settings edited on the admin settings page.
+# Text fields, with the value saved when a field is missing from the form
+TEXT_SETTINGS = (
+    # Business info
+    ('business_name', ''), ('business_email', ''), ('business_phone', ''), ('business_address', ''),
+    # Email settings
+    ('email_provider', 'brevo'),
+    # Brevo settings
+    ('email_from_address', ''), ('email_from_name', ''),
+    # Legacy SMTP settings
+    ('smtp_server', ''), ('smtp_port', '587'), ('smtp_username', ''),
+    # Notification settings
+    ('reminder_hours_before', '24'), ('google_review_link', ''),
+)
+# Checkboxes, saved as 'true'/'false'
+BOOL_SETTINGS = (
+    'email_enabled', 'smtp_use_tls',
+    'send_confirmation_email', 'send_reminder_email', 'send_day_after_email', 'send_followup_email',
+)
+# Only overwritten when a new value is entered
+SECRET_SETTINGS = ('brevo_api_key', 'smtp_password')
+
+
 @app.route('/admin/settings', methods=['GET', 'POST'])
 @login_required
 def admin_settings():
@@ -2484,66 +3025,29 @@ def admin_settings():
             flash('Settings saved successfully!', 'success')
             return redirect(url_for('admin_settings'))
 
-    # Get current settings
-    settings = {
-        'business_name': Settings.get('business_name'),
-        'business_email': Settings.get('business_email'),
-        'business_phone': Settings.get('business_phone'),
-        'business_address': Settings.get('business_address'),
-        'email_enabled': Settings.get('email_enabled'),
-        'email_provider': Settings.get('email_provider', 'brevo'),
-        'brevo_api_key': Settings.get('brevo_api_key'),
-        'email_from_address': Settings.get('email_from_address'),
-        'email_from_name': Settings.get('email_from_name'),
-        'smtp_server': Settings.get('smtp_server'),
-        'smtp_port': Settings.get('smtp_port'),
-        'smtp_username': Settings.get('smtp_username'),
-        'smtp_password': Settings.get('smtp_password'),
-        'smtp_use_tls': Settings.get('smtp_use_tls'),
-        'send_confirmation_email': Settings.get('send_confirmation_email'),
-        'send_reminder_email': Settings.get('send_reminder_email'),
-        'reminder_hours_before': Settings.get('reminder_hours_before'),
-        'send_day_after_email': Settings.get('send_day_after_email', 'true'),  # Default to enabled
-        'send_followup_email': Settings.get('send_followup_email', 'true'),  # Default to enabled
-        'google_review_link': Settings.get('google_review_link'),
-    }
+    # Get current settings in one query
+    keys = [key for key, _ in TEXT_SETTINGS] + list(BOOL_SETTINGS) + list(SECRET_SETTINGS)
+    settings = Settings.get_many(keys, defaults={
+        'email_provider': 'brevo',
+        'send_day_after_email': 'true',  # Default to enabled
+        'send_followup_email': 'true',  # Default to enabled
+    })
 
     return render_template('admin_settings.html', settings=settings, test_result=test_result)
 
 
 def save_settings_from_form(form):
     """Save settings from form data"""
-    # Business info
-    Settings.set('business_name', form.get('business_name', ''))
-    Settings.set('business_email', form.get('business_email', ''))
-    Settings.set('business_phone', form.get('business_phone', ''))
-    Settings.set('business_address', form.get('business_address', ''))
-
-    # Email settings
-    Settings.set('email_enabled', 'true' if form.get('email_enabled') else 'false')
-    Settings.set('email_provider', form.get('email_provider', 'brevo'))
-
-    # Brevo settings
-    if form.get('brevo_api_key'):  # Only update if provided
-        Settings.set('brevo_api_key', form.get('brevo_api_key', ''))
-    Settings.set('email_from_address', form.get('email_from_address', ''))
-    Settings.set('email_from_name', form.get('email_from_name', ''))
+    values = {key: form.get(key, default) for key, default in TEXT_SETTINGS}
+    values.update((key, 'true' if form.get(key) else 'false') for key in BOOL_SETTINGS)
 
-    # Legacy SMTP settings
-    Settings.set('smtp_server', form.get('smtp_server', ''))
-    Settings.set('smtp_port', form.get('smtp_port', '587'))
-    Settings.set('smtp_username', form.get('smtp_username', ''))
-    if form.get('smtp_password'):  # Only update if provided
-        Settings.set('smtp_password', form.get('smtp_password', ''))
-    Settings.set('smtp_use_tls', 'true' if form.get('smtp_use_tls') else 'false')
+    # Secrets are only updated if provided
+    for key in SECRET_SETTINGS:
+        secret = form.get(key)
+        if secret:
+            values[key] = secret
 
-    # Notification settings
-    Settings.set('send_confirmation_email', 'true' if form.get('send_confirmation_email') else 'false')
-    Settings.set('send_reminder_email', 'true' if form.get('send_reminder_email') else 'false')
-    Settings.set('reminder_hours_before', form.get('reminder_hours_before', '24'))
-    Settings.set('send_day_after_email', 'true' if form.get('send_day_after_email') else 'false')
-    Settings.set('send_followup_email', 'true' if form.get('send_followup_email') else 'false')
-    Settings.set('google_review_link', form.get('google_review_link', ''))
+    Settings.set_many(values)
 
 
 # ==================== CLIENT MANAGEMENT ====================
@@ -2552,7 +3056,6 @@ def save_settings_from_form(form):
 @login_required
 def admin_clients():
     """Client list with search and filtering"""
-    from models import Client, ClientTag
 
     # Get filter parameters
     search = request.args.get('search', '').strip()
@@ -2575,36 +3078,37 @@ def admin_clients():
         )
 
     if tag_id:
-        query = query.filter(Client.tags.any(id=tag_id))
+        # Plain join on the assignment table; client-tag pairs are unique so no rows repeat
+        query = query.join(Client.tags).filter(ClientTag.id == tag_id)
 
     if opt_in == 'yes':
         query = query.filter(Client.email_opt_in == True, Client.unsubscribed_at.is_(None))
     elif opt_in == 'no':
         query = query.filter(db.or_(Client.email_opt_in == False, Client.unsubscribed_at.isnot(None)))
 
-    # Order by most recent
-    query = query.order_by(Client.created_at.desc())
+    # Order by most recent (id breaks ties so pages don't overlap)
+    query = query.order_by(Client.created_at.desc(), Client.id.desc())
 
     # Paginate
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-    clients = pagination.items
+    page = max(page, 1)
+    clients, has_next = paginate_without_count(query, page, per_page)
 
     # Get all tags for filter dropdown
     tags = ClientTag.query.order_by(ClientTag.name).all()
 
     # Stats
-    total_clients = Client.query.count()
-    opted_in_count = Client.query.filter(Client.email_opt_in == True, Client.unsubscribed_at.is_(None)).count()
+    counts = get_client_counts()
 
     return render_template('admin_clients.html',
         clients=clients,
-        pagination=pagination,
+        page=page,
+        has_next=has_next,
         tags=tags,
         search=search,
         selected_tag=tag_id,
         opt_in=opt_in,
-        total_clients=total_clients,
-        opted_in_count=opted_in_count
+        total_clients=counts.total,
+        opted_in_count=counts.opted_in
     )
 
 
@@ -2612,7 +3116,6 @@ def admin_clients():
 @login_required
 def admin_clients_sync_from_bookings():
     """Import all existing booking customers as clients"""
-    from models import Client, Booking
     from sqlalchemy import func
 
     # Get all unique customers from bookings
@@ -2633,44 +3136,71 @@ def admin_clients_sync_from_bookings():
 
     created = 0
     updated = 0
+    # Collected as mappings and written with one bulk insert and one bulk update
+    new_rows = []
+    update_rows = {}  # client id -> mapping
+    # Rows given a phone during this sync (not yet in the database), so later
+    # customers sharing that phone still match them
+    pending_by_phone = {}
+
+    tokens = unsubscribe_tokens()
+
+    # Prefetch every client matching a booking email or phone in two queries,
+    # keeping the oldest client when several share one
+    emails = [stat.customer_email for stat in booking_stats]
+    phones = {stat.customer_phone for stat in booking_stats if stat.customer_phone}
+    clients_by_email = {}
+    clients_by_phone = {}
+    contact_columns = load_only(Client.id, Client.email, Client.phone, Client.name)
+    for client in Client.query.options(contact_columns).filter(Client.email.in_(emails)).order_by(Client.id):
+        clients_by_email.setdefault(client.email, client)
+    for client in Client.query.options(contact_columns).filter(Client.phone.in_(phones)).order_by(Client.id):
+        clients_by_phone.setdefault(client.phone, client)
 
     for stat in booking_stats:
         # Check if client already exists
-        existing = Client.query.filter(
-            db.or_(
-                Client.email == stat.customer_email,
-                db.and_(Client.phone == stat.customer_phone, stat.customer_phone != None, stat.customer_phone != '')
-            )
-        ).first()
+        existing = clients_by_email.get(stat.customer_email)
+        if existing is None and stat.customer_phone:
+            existing = clients_by_phone.get(stat.customer_phone)
 
         if existing:
+            row = update_rows.setdefault(existing.id, {'id': existing.id, 'name': existing.name, 'phone': existing.phone})
+        else:
+            row = pending_by_phone.get(stat.customer_phone) if stat.customer_phone else None
+
+        if row is not None:
             # Update stats
-            existing.total_bookings = stat.total_bookings
-            existing.first_booking_date = stat.first_booking
-            existing.last_booking_date = stat.last_booking
-            if not existing.name and stat.customer_name:
-                existing.name = stat.customer_name
-            if not existing.phone and stat.customer_phone:
-                existing.phone = stat.customer_phone
+            row['total_bookings'] = stat.total_bookings
+            row['first_booking_date'] = stat.first_booking
+            row['last_booking_date'] = stat.last_booking
+            if not row['name'] and stat.customer_name:
+                row['name'] = stat.customer_name
+            if not row['phone'] and stat.customer_phone:
+                row['phone'] = stat.customer_phone
+                pending_by_phone.setdefault(stat.customer_phone, row)
             updated += 1
         else:
             # Create new client
-            import secrets
-            client = Client(
-                email=stat.customer_email,
-                phone=stat.customer_phone,
-                name=stat.customer_name,
-                source='booking',
-                email_opt_in=True,
-                unsubscribe_token=secrets.token_urlsafe(32),
-                total_bookings=stat.total_bookings,
-                first_booking_date=stat.first_booking,
-                last_booking_date=stat.last_booking
-            )
-            db.session.add(client)
+            row = {
+                'email': stat.customer_email,
+                'phone': stat.customer_phone,
+                'name': stat.customer_name,
+                'source': 'booking',
+                'email_opt_in': True,
+                'unsubscribe_token': next(tokens),
+                'total_bookings': stat.total_bookings,
+                'first_booking_date': stat.first_booking,
+                'last_booking_date': stat.last_booking
+            }
+            new_rows.append(row)
+            if stat.customer_phone:
+                pending_by_phone.setdefault(stat.customer_phone, row)
             created += 1
 
+    db.session.bulk_insert_mappings(Client, new_rows)
+    db.session.bulk_update_mappings(Client, list(update_rows.values()))
     db.session.commit()
+    bump_client_counts_version()  # Bulk mappings skip the flush events
 
     flash(f'Synced clients from bookings: {created} created, {updated} updated', 'success')
     return redirect(url_for('admin_clients'))
@@ -2680,10 +3210,8 @@ def admin_clients_sync_from_bookings():
 @login_required
 def admin_clients_import():
     """Import clients from CSV"""
-    from models import Client, ClientTag, ClientTagAssignment
     import csv
     import io
-    import secrets
 
     import_result = None
 
@@ -2708,21 +3236,20 @@ def admin_clients_import():
         col_tags = request.form.get('col_tags', '')
         duplicate_action = request.form.get('duplicate_action', 'update')
 
-        # Parse CSV
+        # Parse CSV as a stream, one row at a time, rather than reading it all into memory
+        reader = csv.reader(io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline=''))  # Handle BOM
         try:
-            content = file.read().decode('utf-8-sig')  # Handle BOM
-            reader = csv.reader(io.StringIO(content))
-            rows = list(reader)
+            headers = next(reader, None)
+            first_row = next(reader, None)
         except Exception as e:
             flash(f'Error reading CSV: {str(e)}', 'error')
             return redirect(url_for('admin_clients_import'))
 
-        if len(rows) < 2:
+        if headers is None or first_row is None:
             flash('CSV file is empty or has no data rows', 'error')
             return redirect(url_for('admin_clients_import'))
 
-        headers = rows[0]
-        data_rows = rows[1:]
+        data_rows = chain([first_row], reader)
 
         # Convert column indices
         name_idx = int(col_name) if col_name else None
@@ -2740,75 +3267,103 @@ def admin_clients_import():
         skipped = 0
         errors = []
 
-        for row_num, row in enumerate(data_rows, start=2):
-            try:
-                # Extract values
-                name = row[name_idx].strip() if name_idx is not None and name_idx < len(row) else None
-                email = row[email_idx].strip().lower() if email_idx is not None and email_idx < len(row) else None
-                phone = row[phone_idx].strip() if phone_idx is not None and phone_idx < len(row) else None
-                tags_str = row[tags_idx].strip() if tags_idx is not None and tags_idx < len(row) else None
-
-                # Skip empty rows
-                if not email and not phone:
-                    skipped += 1
-                    continue
-
-                # Find existing client by email OR phone
-                existing = None
-                if email:
-                    existing = Client.query.filter_by(email=email).first()
-                if not existing and phone:
-                    # Normalize phone for comparison
-                    normalized = ''.join(filter(str.isdigit, phone))
-                    if normalized:
-                        for c in Client.query.filter(Client.phone.isnot(None)).all():
-                            c_norm = ''.join(filter(str.isdigit, c.phone)) if c.phone else ''
-                            if c_norm and c_norm == normalized:
-                                existing = c
-                                break
-
-                if existing:
-                    if duplicate_action == 'skip':
+        # Index clients by email and phone digits once, rather than querying
+        # (and scanning every phone) per row; the first match wins as before
+        email_index = {}
+        phone_index = {}
+
+        def index_client(client):
+            if client.email:
+                email_index.setdefault(client.email, client)
+            digits = phone_digits(client.phone)
+            if digits:
+                phone_index.setdefault(digits, client)
+
+        for existing_client in Client.query.options(
+            load_only(Client.id, Client.name, Client.email, Client.phone)
+        ).order_by(Client.id):
+            index_client(existing_client)
+
+        # Tags are few, so load them all once; tags created by this import are added as they appear
+        tags_by_name = {tag.name: tag for tag in ClientTag.query}
+        tokens = unsubscribe_tokens()
+
+        try:
+            for row_num, row in enumerate(data_rows, start=2):
+                # Write pending clients in batches as the file streams in
+                if row_num % 500 == 0:
+                    db.session.flush()
+                try:
+                    # Extract values
+                    name = row[name_idx].strip() if name_idx is not None and name_idx < len(row) else None
+                    email = row[email_idx].strip().lower() if email_idx is not None and email_idx < len(row) else None
+                    phone = row[phone_idx].strip() if phone_idx is not None and phone_idx < len(row) else None
+                    tags_str = row[tags_idx].strip() if tags_idx is not None and tags_idx < len(row) else None
+
+                    # Skip empty rows
+                    if not email and not phone:
                         skipped += 1
                         continue
-                    # Update existing
-                    if name and not existing.name:
-                        existing.name = name
-                    if email and not existing.email:
-                        existing.email = email
-                    if phone and not existing.phone:
-                        existing.phone = phone
-                    updated += 1
-                    client = existing
-                else:
-                    # Create new client
-                    client = Client(
-                        name=name,
-                        email=email,
-                        phone=phone,
-                        source='import',
-                        unsubscribe_token=secrets.token_urlsafe(32)
-                    )
-                    db.session.add(client)
-                    created += 1
-
-                # Handle tags
-                if tags_str:
-                    tag_names = [t.strip() for t in tags_str.split(',') if t.strip()]
-                    for tag_name in tag_names:
-                        # Find or create tag
-                        tag = ClientTag.query.filter_by(name=tag_name).first()
-                        if not tag:
-                            tag = ClientTag(name=tag_name)
-                            db.session.add(tag)
-                            db.session.flush()
-
-                        # Add tag to client if not already assigned
-                        if tag not in client.tags:
-                            client.tags.append(tag)
 
-            except Exception as e:
-                errors.append(f'Row {row_num}: {str(e)}')
+                    # Find existing client by email OR phone
+                    existing = None
+                    if email:
+                        existing = email_index.get(email)
+                    if not existing and phone:
+                        normalized = phone_digits(phone)
+                        if normalized:
+                            existing = phone_index.get(normalized)
+
+                    if existing:
+                        if duplicate_action == 'skip':
+                            skipped += 1
+                            continue
+                        # Update existing
+                        if name and not existing.name:
+                            existing.name = name
+                        if email and not existing.email:
+                            existing.email = email
+                        if phone and not existing.phone:
+                            existing.phone = phone
+                        updated += 1
+                        client = existing
+                    else:
+                        # Create new client
+                        client = Client(
+                            name=name,
+                            email=email,
+                            phone=phone,
+                            source='import',
+                            unsubscribe_token=next(tokens)
+                        )
+                        db.session.add(client)
+                        created += 1
+
+                    # Later rows can match this client too
+                    index_client(client)
+
+                    # Handle tags
+                    if tags_str:
+                        tag_names = [t.strip() for t in tags_str.split(',') if t.strip()]
+                        for tag_name in tag_names:
+                            # Find or create tag
+                            tag = tags_by_name.get(tag_name)
+                            if not tag:
+                                tag = ClientTag(name=tag_name)
+                                db.session.add(tag)
+                                tags_by_name[tag_name] = tag
+
+                            # Add tag to client if not already assigned
+                            if tag not in client.tags:
+                                client.tags.append(tag)
+
+                except Exception as e:
+                    errors.append(f'Row {row_num}: {str(e)}')
+        except (UnicodeDecodeError, csv.Error) as e:
+            # The file turned out to be unreadable partway through
+            db.session.rollback()
+            flash(f'Error reading CSV: {str(e)}', 'error')
+            return redirect(url_for('admin_clients_import'))
 
         db.session.commit()
 
@@ -2829,18 +3384,15 @@ def admin_clients_import():
 @login_required
 def admin_client_detail(client_id):
     """View/edit client details"""
-    from models import Client, ClientTag, ClientNote, Booking
 
     client = Client.query.get_or_404(client_id)
 
-    # Get client's bookings
-    bookings = Booking.query.filter(
-        db.or_(
-            Booking.customer_email == client.email,
-            Booking.customer_phone == client.phone
-        ) if client.email and client.phone else (
-            Booking.customer_email == client.email if client.email else Booking.customer_phone == client.phone
-        )
+    # Get client's bookings, with just the columns the bookings table shows
+    bookings = Booking.query.options(
+        load_only(Booking.id, Booking.booking_date, Booking.booking_time, Booking.end_time, Booking.status),
+        joinedload(Booking.service).load_only(Service.name)
+    ).filter(
+        Booking.contact_filter(client.email, client.phone)
     ).order_by(Booking.booking_date.desc()).limit(20).all()
 
     # Get client notes (linked by email)
@@ -2863,7 +3415,6 @@ def admin_client_detail(client_id):
 @login_required
 def admin_client_edit(client_id):
     """Update client details"""
-    from models import Client
 
     client = Client.query.get_or_404(client_id)
 
@@ -2882,7 +3433,6 @@ def admin_client_edit(client_id):
 @login_required
 def admin_client_tags(client_id):
     """Update client tags"""
-    from models import Client, ClientTag
 
     client = Client.query.get_or_404(client_id)
     tag_ids = request.form.getlist('tags')
@@ -2903,7 +3453,6 @@ def admin_client_tags(client_id):
 @login_required
 def admin_client_tags_list():
     """Manage client tags"""
-    from models import ClientTag
 
     tags = ClientTag.query.order_by(ClientTag.name).all()
     return render_template('admin_client_tags.html', tags=tags)
@@ -2913,7 +3462,6 @@ def admin_client_tags_list():
 @login_required
 def admin_client_tag_add():
     """Create a new tag"""
-    from models import ClientTag
 
     name = request.form.get('name', '').strip()
     color = request.form.get('color', '#6366f1')
@@ -2938,7 +3486,6 @@ def admin_client_tag_add():
 @login_required
 def admin_client_tag_delete(tag_id):
     """Delete a tag"""
-    from models import ClientTag
 
     tag = ClientTag.query.get_or_404(tag_id)
     name = tag.name
@@ -2956,7 +3503,6 @@ def admin_client_tag_delete(tag_id):
 @login_required
 def admin_campaigns():
     """List all email campaigns"""
-    from models import EmailCampaign
 
     campaigns = EmailCampaign.query.order_by(EmailCampaign.created_at.desc()).all()
     return render_template('admin_campaigns.html', campaigns=campaigns)
@@ -2966,7 +3512,6 @@ def admin_campaigns():
 @login_required
 def admin_campaign_new():
     """Create a new email campaign"""
-    from models import EmailCampaign, EmailTemplate, ClientTag, Client
 
     if request.method == 'POST':
         campaign = EmailCampaign(
@@ -2993,11 +3538,7 @@ def admin_campaign_new():
     # Get data for form
     templates = EmailTemplate.query.order_by(EmailTemplate.name).all()
     tags = ClientTag.query.order_by(ClientTag.name).all()
-    total_opted_in = Client.query.filter(
-        Client.email_opt_in == True,
-        Client.unsubscribed_at.is_(None),
-        Client.email.isnot(None)
-    ).count()
+    total_opted_in = get_client_counts().emailable
 
     return render_template('admin_campaign_edit.html',
         campaign=None,
@@ -3011,7 +3552,6 @@ def admin_campaign_new():
 @login_required
 def admin_campaign_edit(campaign_id):
     """Edit an existing campaign"""
-    from models import EmailCampaign, EmailTemplate, ClientTag, Client
 
     campaign = EmailCampaign.query.get_or_404(campaign_id)
 
@@ -3040,11 +3580,7 @@ def admin_campaign_edit(campaign_id):
 
     templates = EmailTemplate.query.order_by(EmailTemplate.name).all()
     tags = ClientTag.query.order_by(ClientTag.name).all()
-    total_opted_in = Client.query.filter(
-        Client.email_opt_in == True,
-        Client.unsubscribed_at.is_(None),
-        Client.email.isnot(None)
-    ).count()
+    total_opted_in = get_client_counts().emailable
 
     return render_template('admin_campaign_edit.html',
         campaign=campaign,
@@ -3058,7 +3594,6 @@ def admin_campaign_edit(campaign_id):
 @login_required
 def admin_campaign_send(campaign_id):
     """Start sending a campaign"""
-    from models import EmailCampaign, CampaignRecipient, Client, ClientTag
 
     campaign = EmailCampaign.query.get_or_404(campaign_id)
 
@@ -3076,7 +3611,8 @@ def admin_campaign_send(campaign_id):
     # Filter by tags if not targeting all
     if not campaign.target_all and campaign.target_tag_ids:
         tag_ids = campaign.get_target_tags()
-        query = query.filter(Client.tags.any(ClientTag.id.in_(tag_ids)))
+        # DISTINCT since a client may carry more than one targeted tag
+        query = query.join(Client.tags).filter(ClientTag.id.in_(tag_ids)).distinct()
 
     clients = query.all()
 
@@ -3084,35 +3620,20 @@ def admin_campaign_send(campaign_id):
         flash('No eligible recipients for this campaign', 'error')
         return redirect(url_for('admin_campaign_edit', campaign_id=campaign_id))
 
-    # Create recipient records
-    for client in clients:
-        recipient = CampaignRecipient(
-            campaign_id=campaign.id,
-            client_id=client.id,
-            status='pending'
-        )
-        db.session.add(recipient)
+    # Create recipient records in one bulk insert (the query is DISTINCT, so
+    # the unique campaign/client constraint can't be hit)
+    db.session.bulk_insert_mappings(CampaignRecipient, [
+        {'campaign_id': campaign.id, 'client_id': client.id, 'status': 'pending'}
+        for client in clients
+    ])
 
     campaign.total_recipients = len(clients)
     campaign.status = 'sending'
     db.session.commit()
 
-    # Send emails (in batches to avoid timeout)
-    from email_service import send_campaign_email
-
-    sent_count = 0
-    for client in clients[:50]:  # Send first batch immediately
-        if send_campaign_email(campaign, client):
-            sent_count += 1
-
-    remaining = len(clients) - 50
-    if remaining > 0:
-        flash(f'Sending started! {sent_count} emails sent, {remaining} remaining (will continue in background)', 'success')
-    else:
-        campaign.status = 'sent'
-        campaign.sent_at = datetime.utcnow()
-        db.session.commit()
-        flash(f'Campaign sent to {sent_count} recipients!', 'success')
+    # Send in the background so the request returns straight away
+    email_executor.submit(_send_campaign, campaign.id)
+    flash(f'Sending started! {len(clients)} emails will be sent in the background', 'success')
 
     return redirect(url_for('admin_campaign_edit', campaign_id=campaign_id))
 
@@ -3121,7 +3642,6 @@ def admin_campaign_send(campaign_id):
 @login_required
 def admin_campaign_delete(campaign_id):
     """Delete a campaign"""
-    from models import EmailCampaign
 
     campaign = EmailCampaign.query.get_or_404(campaign_id)
 
@@ -3140,7 +3660,6 @@ def admin_campaign_delete(campaign_id):
 @login_required
 def admin_campaign_templates():
     """Manage email templates"""
-    from models import EmailTemplate
 
     templates = EmailTemplate.query.order_by(EmailTemplate.category, EmailTemplate.name).all()
     return render_template('admin_campaign_templates.html', templates=templates)
@@ -3149,7 +3668,6 @@ def admin_campaign_templates():
 @app.route('/unsubscribe/<token>')
 def unsubscribe(token):
     """Handle email unsubscribe"""
-    from models import Client
 
     client = Client.query.filter_by(unsubscribe_token=token).first()
 
@@ -3170,14 +3688,28 @@ def unsubscribe(token):
 @app.route('/api/services')
 def api_services():
     """Get all active services"""
-    services = Service.query.filter_by(is_active=True).all()
-    return jsonify([{
+    body, etag = _get_services_json_cached(*_catalog_cache_key())
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = CATALOG_CACHE_TTL_SECONDS
+    return response
+
+
+@lru_cache(maxsize=1)
+def _get_services_json_cached(version, ttl_bucket):
+    """Serialized /api/services body and its ETag, rebuilt when the catalog changes"""
+    body = app.json.dumps([{
         'id': s.id,
         'name': s.name,
         'duration_minutes': s.duration_minutes,
         'price': s.price,
         'description': s.description
-    } for s in services])
+    } for s in _get_active_services_cached(version, ttl_bucket)])
+    return body, hashlib.sha1(body.encode()).hexdigest()
 
 
 @app.route('/api/slots/<int:service_id>/<booking_date>')
@@ -3187,14 +3719,22 @@ def api_slots(service_id, booking_date):
     if not service:
         return jsonify({'error': 'Service not found'}), 404
 
-    booking_date_obj = datetime.strptime(booking_date, '%Y-%m-%d').date()
+    try:
+        booking_date_obj = date.fromisoformat(booking_date)
+    except ValueError:
+        return jsonify({'error': 'Invalid date format'}), 400
     slots = get_available_slots_for_date(service, booking_date_obj)
 
-    return jsonify({
+    response = jsonify({
         'service': service.name,
         'date': booking_date,
         'slots': slots
     })
+    # Slots change with every booking, so clients must revalidate each time;
+    # an unchanged slot list comes back as an empty 304
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 
 @app.route('/api/available-slots')
@@ -3222,24 +3762,24 @@ def api_available_slots():
     if not service_ids:
         return jsonify({'error': 'service_id or service_ids required', 'slots': []})
 
-    # Get services and calculate total duration if not provided
-    services = Service.query.filter(Service.id.in_(service_ids)).all()
-    if not services:
+    # Get service names and their total duration (cached with the catalog)
+    summary = get_services_summary(service_ids)
+    if not summary:
         return jsonify({'error': 'No services found', 'slots': []})
+    service_names, services_duration = summary
 
-    # Calculate total duration from services if not explicitly provided
+    # Use the services' total duration if not explicitly provided
     if not total_duration:
-        total_duration = sum(s.duration_minutes for s in services)
+        total_duration = services_duration
 
     try:
-        booking_date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
+        booking_date_obj = date.fromisoformat(date_str)
     except ValueError:
         return jsonify({'error': 'Invalid date format', 'slots': []})
 
     # Get slots using the total duration
     slots = get_available_slots_for_duration(total_duration, booking_date_obj)
 
-    service_names = ', '.join(s.name for s in services)
     return jsonify({
         'services': service_names,
         'date': date_str,
@@ -3248,34 +3788,150 @@ def api_available_slots():
     })
 
 
-def start_reminder_scheduler():
-    """Background thread to check and send reminders and follow-ups periodically"""
-    def run_scheduler():
-        followup_counter = 0  # Track iterations for daily follow-up check
+def run_every(name, interval_seconds, job):
+    """
+    Run job on its own daemon thread every interval_seconds, starting now. Runs are
+    kept on a fixed cadence, so a slow run doesn't push later ones back.
+    """
+    def loop():
+        next_run = time.monotonic()
         while True:
             try:
-                from email_service import check_and_send_reminders, check_and_send_followups, check_and_send_day_after_emails
+                job()
+            except Exception as e:
+                print(f"[SCHEDULER ERROR] {name}: {e}")
+            next_run += interval_seconds
+            time.sleep(max(0, next_run - time.monotonic()))
 
-                # Check reminders every 30 minutes
-                check_and_send_reminders(app)
+    threading.Thread(target=loop, name=f'scheduler-{name}', daemon=True).start()
 
-                # Check day-after emails every 30 minutes (will only send if 24hrs have passed)
-                check_and_send_day_after_emails(app)
 
-                # Check 6-week follow-ups once per day (every 48 iterations = 24 hours)
-                followup_counter += 1
-                if followup_counter >= 48:
-                    check_and_send_followups(app)
-                    followup_counter = 0
+def start_reminder_scheduler():
+    """Start background jobs that send reminders and follow-ups, each on its own schedule"""
+    from email_service import check_and_send_reminders, check_and_send_followups, check_and_send_day_after_emails
+
+    def complete_and_send_day_after():
+        # Mark finished appointments completed even when no admin pages are being loaded;
+        # day-after (and later 6-week) emails only go to completed bookings
+        with app.app_context():
+            auto_complete_past_appointments(force=True)
+        # Will only send once 24hrs have passed
+        check_and_send_day_after_emails(app)
+
+    run_every('reminders', 30 * 60, lambda: check_and_send_reminders(app))
+    run_every('day-after', 30 * 60, complete_and_send_day_after)
+    run_every('followups', 24 * 60 * 60, lambda: check_and_send_followups(app))
+    print("[SCHEDULER] Reminder & follow-up scheduler started (reminders & day-after every 30 min, 6-week follow-ups daily)")
+
+
+# Booking emails are sent from a small thread pool so SMTP latency stays off the request
+email_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='email')
+
+
+def _send_booking_email(send, booking_id):
+    with app.app_context():
+        try:
+            booking = db.session.get(Booking, booking_id)
+            if booking and not send(booking):
+                app.logger.warning("[EMAIL] %s did not send for booking #%s", send.__name__, booking_id)
+        except Exception as e:
+            app.logger.warning("[EMAIL ERROR] %s failed for booking #%s: %s", send.__name__, booking_id, e)
 
-            except Exception as e:
-                print(f"[SCHEDULER ERROR] {e}")
-            # Check every 30 minutes
-            time.sleep(30 * 60)
 
-    thread = threading.Thread(target=run_scheduler, daemon=True)
+def queue_booking_email(send, booking_id):
+    """
+    Run an email_service send function for a booking in the background. Pass the
+    id (the worker loads its own copy) and call after the booking is committed.
+    """
+    email_executor.submit(_send_booking_email, send, booking_id)
+
+
+# Recipients of one campaign are sent this many at a time
+CAMPAIGN_SEND_WORKERS = 8
+
+
+def _send_campaign_recipient(campaign_id, client_id):
+    """Send one campaign email in its own app context (and so its own session)"""
+    from email_service import send_campaign_email
+
+    with app.app_context():
+        try:
+            campaign = db.session.get(EmailCampaign, campaign_id)
+            client = db.session.get(Client, client_id)
+            send_campaign_email(campaign, client)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.warning("[CAMPAIGN ERROR] Campaign #%s to client #%s failed: %s", campaign_id, client_id, e)
+
+
+def _send_campaign(campaign_id):
+    """Send a campaign to its pending recipients concurrently, then mark it sent"""
+    with app.app_context():
+        try:
+            client_ids = db.session.execute(
+                db.select(CampaignRecipient.client_id).filter(
+                    CampaignRecipient.campaign_id == campaign_id,
+                    CampaignRecipient.status == 'pending'
+                ).order_by(CampaignRecipient.id)
+            ).scalars().all()
+            # Don't hold this session's connection while the sends run
+            db.session.close()
+
+            # A pool of its own: waiting on email_executor from one of its own
+            # tasks could deadlock once every worker is a waiting campaign
+            with ThreadPoolExecutor(max_workers=CAMPAIGN_SEND_WORKERS, thread_name_prefix='campaign') as pool:
+                for client_id in client_ids:
+                    pool.submit(_send_campaign_recipient, campaign_id, client_id)
+
+            # Every send has finished once the pool has shut down
+            campaign = db.session.get(EmailCampaign, campaign_id)
+            campaign.status = 'sent'
+            campaign.sent_at = datetime.utcnow()
+            db.session.commit()
+            print(f"[CAMPAIGN] Campaign #{campaign_id} sent: {campaign.sent_count or 0} sent, {campaign.failed_count or 0} failed")
+        except Exception as e:
+            print(f"[CAMPAIGN ERROR] Sending campaign #{campaign_id} failed: {e}")
+
+
+# Activity log entries are queued by ActivityLog.log and inserted in batches
+ACTIVITY_LOG_FLUSH_SECONDS = 0.25
+_activity_log_queue = queue.Queue()
+
+
+def flush_activity_log(*rows):
+    """Insert the given rows plus every queued activity log entry in one statement"""
+    rows = list(rows)
+    while True:
+        try:
+            rows.append(_activity_log_queue.get_nowait())
+        except queue.Empty:
+            break
+    if not rows:
+        return
+
+    with app.app_context():
+        try:
+            db.session.execute(db.insert(ActivityLog), rows)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"[ACTIVITY LOG ERROR] Could not write {len(rows)} entries: {e}")
+
+
+def start_activity_log_writer():
+    """Background thread that batches activity log inserts off the request path"""
+    def run_writer():
+        while True:
+            # Wait for an entry, then give others a moment to arrive before writing
+            first = _activity_log_queue.get()
+            time.sleep(ACTIVITY_LOG_FLUSH_SECONDS)
+            flush_activity_log(first)
+
+    ActivityLog.writer = _activity_log_queue.put
+    thread = threading.Thread(target=run_writer, daemon=True)
     thread.start()
-    print("[SCHEDULER] Reminder & follow-up scheduler started (reminders every 30 min, day-after & 6-week follow-ups daily)")
+    # Write anything still queued when the process exits
+    atexit.register(flush_activity_log)
 
 
 # ==================== CUSTOMER ACCOUNT SYSTEM ====================
@@ -3334,6 +3990,7 @@ def customer_register():
         for booking in existing_bookings:
             booking.user_id = user.id
         db.session.commit()
+        invalidate_customer_dashboard(user.id)
 
         print(f"\n[NEW USER] {name} ({email}) registered")
 
@@ -3393,6 +4050,70 @@ def customer_logout():
     return redirect(url_for('home'))
 
 
+# Customer dashboard stats are cached in Redis (when configured) until the customer
+# books, reschedules or cancels; the TTL bounds staleness from admin-side changes
+DASHBOARD_CACHE_SECONDS = 300
+
+
+def _dashboard_cache_key(user_id):
+    return f'dash:{user_id}'
+
+
+def get_customer_dashboard_stats(user_id):
+    """(next_appointment_id, total_bookings, completed_bookings) for a customer"""
+    if redis_client is not None:
+        try:
+            cached = redis_client.get(_dashboard_cache_key(user_id))
+            if cached is not None:
+                return tuple(json.loads(cached))
+        except redis.RedisError as e:
+            print(f"[CACHE ERROR] Reading dashboard stats for user #{user_id}: {e}")
+
+    # Get next upcoming appointment
+    next_appointment_id = db.session.execute(
+        db.select(Booking.id).filter(
+            Booking.user_id == user_id,
+            Booking.booking_date >= date.today(),
+            Booking.status == 'confirmed'
+        ).order_by(Booking.booking_date, Booking.booking_time).limit(1)
+    ).scalar()
+
+    # Get total and completed bookings counts in one query
+    total_bookings, completed_bookings = db.session.execute(
+        db.select(
+            db.func.count(Booking.id),
+            db.func.count(db.case((Booking.status == 'completed', 1)))
+        ).filter(Booking.user_id == user_id)
+    ).one()
+
+    stats = (next_appointment_id, total_bookings, completed_bookings)
+    if redis_client is not None:
+        try:
+            redis_client.setex(_dashboard_cache_key(user_id), DASHBOARD_CACHE_SECONDS, json.dumps(stats))
+        except redis.RedisError as e:
+            print(f"[CACHE ERROR] Storing dashboard stats for user #{user_id}: {e}")
+    return stats
+
+
+def invalidate_customer_dashboard(user_id):
+    """Drop a customer's cached dashboard stats after their bookings change"""
+    if redis_client is not None and user_id:
+        try:
+            redis_client.delete(_dashboard_cache_key(user_id))
+        except redis.RedisError as e:
+            print(f"[CACHE ERROR] Invalidating dashboard stats for user #{user_id}: {e}")
+
+
+def _load_next_appointment(user_id, booking_id):
+    """Load a customer's next appointment, or None if it is no longer upcoming and confirmed"""
+    return Booking.query.options(joinedload(Booking.service)).filter(
+        Booking.id == booking_id,
+        Booking.user_id == user_id,
+        Booking.status == 'confirmed',
+        Booking.booking_date >= date.today()
+    ).first()
+
+
 @app.route('/customer/dashboard')
 @customer_login_required
 def customer_dashboard():
@@ -3403,22 +4124,16 @@ def customer_dashboard():
     user_id = session.get('customer_id')
     user = User.query.get(user_id)
 
-    # Get next upcoming appointment
-    today = date.today()
-    next_appointment = Booking.query.filter(
-        Booking.user_id == user_id,
-        Booking.booking_date >= today,
-        Booking.status.in_(['confirmed'])
-    ).order_by(Booking.booking_date, Booking.booking_time).first()
-
-    # Get total bookings count
-    total_bookings = Booking.query.filter_by(user_id=user_id).count()
-
-    # Get count of completed bookings
-    completed_bookings = Booking.query.filter(
-        Booking.user_id == user_id,
-        Booking.status == 'completed'
-    ).count()
+    next_appointment_id, total_bookings, completed_bookings = get_customer_dashboard_stats(user_id)
+    next_appointment = None
+    if next_appointment_id:
+        next_appointment = _load_next_appointment(user_id, next_appointment_id)
+        if next_appointment is None:
+            # Cached booking is no longer upcoming (cancelled, moved, completed); recompute
+            invalidate_customer_dashboard(user_id)
+            next_appointment_id, total_bookings, completed_bookings = get_customer_dashboard_stats(user_id)
+            if next_appointment_id:
+                next_appointment = _load_next_appointment(user_id, next_appointment_id)
 
     return render_template('customer_dashboard.html',
                          user=user,
@@ -3438,23 +4153,33 @@ def customer_appointments():
     today = date.today()
     now = datetime.now()
 
-    # Get all future bookings (confirmed only)
-    appointments = Booking.query.filter(
+    # Get all future bookings (confirmed only), with their services for the listing
+    appointments = Booking.query.options(joinedload(Booking.service)).filter(
         Booking.user_id == user_id,
         Booking.booking_date >= today,
         Booking.status == 'confirmed'
     ).order_by(Booking.booking_date, Booking.booking_time).all()
 
     # Add can_modify flag (only if >24 hours away)
+    modify_cutoff = now + timedelta(hours=24)
     for apt in appointments:
-        apt_datetime = datetime.combine(apt.booking_date, datetime.strptime(apt.booking_time, '%H:%M').time())
-        hours_until = (apt_datetime - now).total_seconds() / 3600
-        apt.can_modify = hours_until > 24
-        apt.hours_until = hours_until
+        apt.can_modify = apt.starts_at > modify_cutoff
 
     return render_template('customer_appointments.html', appointments=appointments)
 
 
+def get_aftercare_by_service(service_ids):
+    """{service_id: aftercare} for the active aftercare guide of each service that has one"""
+    aftercare_map = {}
+    if service_ids:
+        for aftercare in Aftercare.query.filter(
+            Aftercare.service_id.in_(service_ids),
+            Aftercare.is_active == True
+        ).order_by(Aftercare.id):
+            aftercare_map.setdefault(aftercare.service_id, aftercare)
+    return aftercare_map
+
+
 @app.route('/customer/history')
 @customer_login_required
 def customer_history():
@@ -3465,20 +4190,16 @@ def customer_history():
     user_id = session.get('customer_id')
 
     # Get all completed and no-show bookings (past appointments)
-    history = Booking.query.filter(
+    history = Booking.query.options(joinedload(Booking.service)).filter(
         Booking.user_id == user_id,
-        Booking.status.in_(['completed', 'no_show'])
+        Booking.status.in_(HISTORY_STATUSES)
     ).order_by(Booking.booking_date.desc(), Booking.booking_time.desc()).all()
 
     # Get unique services for aftercare links
     service_ids = set(b.service_id for b in history if b.status == 'completed')
 
     # Get aftercare guides for these services
-    aftercare_map = {}
-    for service_id in service_ids:
-        aftercare = Aftercare.query.filter_by(service_id=service_id, is_active=True).first()
-        if aftercare:
-            aftercare_map[service_id] = aftercare
+    aftercare_map = get_aftercare_by_service(service_ids)
 
     return render_template('customer_history.html', history=history, aftercare_map=aftercare_map)
 
@@ -3490,14 +4211,14 @@ def customer_reschedule(booking_id):
     user_id = session.get('customer_id')
 
     # Get the booking and verify ownership
-    booking = Booking.query.filter_by(id=booking_id, user_id=user_id).first()
+    booking = Booking.query.options(joinedload(Booking.service)).filter_by(id=booking_id, user_id=user_id).first()
     if not booking:
         flash('Booking not found.', 'error')
         return redirect(url_for('customer_appointments'))
 
     # Check if booking can be modified (>24 hours away)
     now = datetime.now()
-    apt_datetime = datetime.combine(booking.booking_date, datetime.strptime(booking.booking_time, '%H:%M').time())
+    apt_datetime = booking.starts_at
     hours_until = (apt_datetime - now).total_seconds() / 3600
 
     if hours_until <= 24:
@@ -3516,10 +4237,7 @@ def customer_reschedule(booking_id):
 
         # Calculate new end time
         service = booking.service
-        start_parts = new_time.split(':')
-        start_minutes = int(start_parts[0]) * 60 + int(start_parts[1])
-        end_minutes = start_minutes + service.duration_minutes
-        new_end_time = f"{end_minutes // 60:02d}:{end_minutes % 60:02d}"
+        new_end_time = minutes_to_time(time_to_minutes(new_time) + service.duration_minutes)
 
         # Update booking
         old_date = booking.booking_date
@@ -3530,6 +4248,7 @@ def customer_reschedule(booking_id):
         booking.end_time = new_end_time
         booking.reminder_sent = False  # Reset reminder so they get a new one
         db.session.commit()
+        invalidate_customer_dashboard(user_id)
 
         print(f"\n[RESCHEDULED] Booking #{booking.id}")
         print(f"  Customer: {booking.customer_name}")
@@ -3562,14 +4281,14 @@ def customer_cancel(booking_id):
     user_id = session.get('customer_id')
 
     # Get the booking and verify ownership
-    booking = Booking.query.filter_by(id=booking_id, user_id=user_id).first()
+    booking = Booking.query.options(joinedload(Booking.service)).filter_by(id=booking_id, user_id=user_id).first()
     if not booking:
         flash('Booking not found.', 'error')
         return redirect(url_for('customer_appointments'))
 
     # Check if booking can be modified (>24 hours away)
     now = datetime.now()
-    apt_datetime = datetime.combine(booking.booking_date, datetime.strptime(booking.booking_time, '%H:%M').time())
+    apt_datetime = booking.starts_at
     hours_until = (apt_datetime - now).total_seconds() / 3600
 
     if hours_until <= 24:
@@ -3579,6 +4298,7 @@ def customer_cancel(booking_id):
     # Cancel the booking
     booking.status = 'cancelled'
     db.session.commit()
+    invalidate_customer_dashboard(user_id)
 
     print(f"\n[CUSTOMER CANCELLED] Booking #{booking.id}")
     print(f"  Customer: {booking.customer_name}")
@@ -3598,25 +4318,25 @@ def customer_aftercare():
 
     user_id = session.get('customer_id')
 
-    # Get all completed bookings for this user
-    completed_bookings = Booking.query.filter(
+    # Get all completed bookings for this user, with their services
+    completed_bookings = Booking.query.options(joinedload(Booking.service)).filter(
         Booking.user_id == user_id,
         Booking.status == 'completed'
     ).all()
 
-    # Get unique services
-    service_ids = set(b.service_id for b in completed_bookings)
-    services_with_aftercare = []
-
-    for service_id in service_ids:
-        service = Service.query.get(service_id)
-        aftercare = Aftercare.query.filter_by(service_id=service_id, is_active=True).first()
-        if aftercare:
-            services_with_aftercare.append({
-                'service': service,
-                'aftercare': aftercare,
-                'last_booking': max(b.booking_date for b in completed_bookings if b.service_id == service_id)
-            })
+    # Latest booking per service, in one pass
+    last_bookings = {}
+    for b in completed_bookings:
+        last = last_bookings.get(b.service_id)
+        if last is None or b.booking_date > last.booking_date:
+            last_bookings[b.service_id] = b
+
+    aftercare_map = get_aftercare_by_service(last_bookings)
+    services_with_aftercare = [{
+        'service': last_bookings[service_id].service,
+        'aftercare': aftercare,
+        'last_booking': last_bookings[service_id].booking_date
+    } for service_id, aftercare in sorted(aftercare_map.items())]
 
     # Also get general aftercare (no service_id)
     general_aftercare = Aftercare.query.filter_by(service_id=None, is_active=True).all()
@@ -3668,7 +4388,7 @@ def add_aftercare():
         flash('Aftercare guide added successfully!', 'success')
         return redirect(url_for('admin_aftercare'))
 
-    services = Service.query.filter_by(is_active=True).order_by(Service.name).all()
+    services = sorted(get_active_services(), key=lambda s: s.name)
     return render_template('add_aftercare.html', services=services)
 
 
@@ -3689,7 +4409,7 @@ def edit_aftercare(aftercare_id):
         flash('Aftercare guide updated successfully!', 'success')
         return redirect(url_for('admin_aftercare'))
 
-    services = Service.query.filter_by(is_active=True).order_by(Service.name).all()
+    services = sorted(get_active_services(), key=lambda s: s.name)
     return render_template('edit_aftercare.html', aftercare=aftercare, services=services)
 
 
@@ -3710,9 +4430,14 @@ def delete_aftercare(aftercare_id):
 @login_required
 def get_notifications():
     """API endpoint to get recent activity for notification bell"""
-    # Get last 20 activities
-    activities = ActivityLog.query.order_by(ActivityLog.created_at.desc()).limit(20).all()
-    unread_count = ActivityLog.query.filter_by(is_read=False).count()
+    # Get last 20 activities, with the unread count over the whole log as a
+    # window function in the same query
+    rows = db.session.execute(
+        db.select(ActivityLog, db.func.count(db.case((ActivityLog.is_read == False, 1))).over().label('unread'))
+        .order_by(ActivityLog.created_at.desc()).limit(20)
+    ).all()
+    activities = [row.ActivityLog for row in rows]
+    unread_count = rows[0].unread if rows else 0
 
     return jsonify({
         'unread_count': unread_count,
@@ -3732,7 +4457,8 @@ def get_notifications():
 @login_required
 def mark_notifications_read():
     """Mark all notifications as read"""
-    ActivityLog.query.filter_by(is_read=False).update({'is_read': True})
+    # Plain bulk UPDATE; nothing in the session needs to see the new flags
+    ActivityLog.query.filter_by(is_read=False).update({'is_read': True}, synchronize_session=False)
     db.session.commit()
     return jsonify({'success': True})
 
@@ -3896,6 +4622,106 @@ with app.app_context():
                 print(f"Migration note: {e}")
                 db.session.rollback()
 
+    # Add integer minute columns to booking/blocked_time and backfill them from the 'HH:MM' strings
+    for model, time_columns in ((Booking, ('booking_time', 'end_time')), (BlockedTime, ('start_time', 'end_time'))):
+        table_name = model.__tablename__
+        existing_columns = [c['name'] for c in inspector.get_columns(table_name)]
+        for time_column in time_columns:
+            if f'{time_column}_min' not in existing_columns:
+                try:
+                    db.session.execute(text(f'ALTER TABLE {table_name} ADD COLUMN {time_column}_min SMALLINT'))
+                    db.session.commit()
+                    print(f"Added {time_column}_min column to {table_name} table")
+                except Exception as e:
+                    print(f"Migration note: {e}")
+                    db.session.rollback()
+
+        first, second = time_columns
+        missing = db.session.execute(
+            db.select(model.id, getattr(model, first), getattr(model, second)).filter(
+                db.or_(
+                    db.and_(getattr(model, first).isnot(None), getattr(model, f'{first}_min').is_(None)),
+                    db.and_(getattr(model, second).isnot(None), getattr(model, f'{second}_min').is_(None))
+                )
+            )
+        ).all()
+        if missing:
+            db.session.bulk_update_mappings(model, [{
+                'id': row[0],
+                f'{first}_min': time_to_minutes(row[1]) if row[1] else None,
+                f'{second}_min': time_to_minutes(row[2]) if row[2] else None
+            } for row in missing])
+            db.session.commit()
+            print(f"Backfilled minute columns for {len(missing)} {table_name} rows")
+
+    # Add normalized contact columns to booking and backfill them
+    booking_columns = [c['name'] for c in inspector.get_columns('booking')]
+    for column, column_type in (('customer_email_normalized', 'VARCHAR(120)'), ('customer_phone_normalized', 'VARCHAR(20)')):
+        if column not in booking_columns:
+            try:
+                db.session.execute(text(f'ALTER TABLE booking ADD COLUMN {column} {column_type}'))
+                db.session.commit()
+                print(f"Added {column} column to booking table")
+            except Exception as e:
+                print(f"Migration note: {e}")
+                db.session.rollback()
+
+    candidates = db.session.execute(
+        db.select(
+            Booking.id, Booking.customer_email, Booking.customer_phone,
+            Booking.customer_email_normalized, Booking.customer_phone_normalized
+        ).filter(
+            db.or_(
+                db.and_(Booking.customer_email_normalized.is_(None), Booking.customer_email != ''),
+                db.and_(Booking.customer_phone_normalized.is_(None), Booking.customer_phone != '')
+            )
+        )
+    ).all()
+    # Blank or too-short contact details normalize to NULL; skip them so they
+    # aren't rewritten on every startup
+    missing = []
+    for row in candidates:
+        email = row.customer_email_normalized or normalize_email(row.customer_email)
+        phone = row.customer_phone_normalized or normalize_phone(row.customer_phone)
+        if email != row.customer_email_normalized or phone != row.customer_phone_normalized:
+            missing.append({'id': row.id, 'customer_email_normalized': email, 'customer_phone_normalized': phone})
+    if missing:
+        db.session.bulk_update_mappings(Booking, missing)
+        db.session.commit()
+        print(f"Backfilled normalized contact columns for {len(missing)} booking rows")
+
+    # Booking email lookups use customer_email_normalized now
+    try:
+        db.session.execute(text('DROP INDEX IF EXISTS ix_booking_email_lower_status_date'))
+        db.session.commit()
+    except Exception as e:
+        print(f"Migration note: {e}")
+        db.session.rollback()
+
+    # Add any indexes missing from existing tables (db.create_all only indexes new tables)
+    # IF NOT EXISTS rather than checkfirst: SQLite can't reflect the expression indexes
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                db.session.execute(CreateIndex(index, if_not_exists=True))
+                db.session.commit()
+            except Exception as e:
+                print(f"Migration note: {e}")
+                db.session.rollback()
+
+    # Trigram indexes so the client search's ILIKE '%...%' can use an index (PostgreSQL only)
+    if db.engine.dialect.name == 'postgresql':
+        try:
+            db.session.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+            for column in ('name', 'email', 'phone'):
+                db.session.execute(text(
+                    f'CREATE INDEX IF NOT EXISTS ix_client_{column}_trgm ON client USING gin ({column} gin_trgm_ops)'
+                ))
+            db.session.commit()
+        except Exception as e:
+            print(f"Migration note: {e}")
+            db.session.rollback()
+
     # Create initial owner account if none exists
     owner_count = AdminUser.query.filter_by(role='owner').count()
     if owner_count == 0:
@@ -3911,7 +4737,6 @@ with app.app_context():
         print(f"Created initial owner account: {ADMIN_USERNAME}")
 
     # Seed default email templates if none exist
-    from models import EmailTemplate
     if EmailTemplate.query.count() == 0:
         default_templates = [
             EmailTemplate(
@@ -3996,8 +4821,9 @@ with app.app_context():
         db.session.commit()
         print("Created default email templates")
 
-# Start the reminder scheduler (runs in background thread)
+# Start the reminder scheduler and activity log writer (background threads)
 start_reminder_scheduler()
+start_activity_log_writer()
 
 
 if __name__ == '__main__':
@@ -4013,4 +4839,7 @@ if __name__ == '__main__':
     print(f"Admin credentials: {ADMIN_USERNAME} / {ADMIN_PASSWORD}")
     print("=" * 50 + "\n")
 
+    if debug:
+        app.logger.setLevel(logging.DEBUG)
+
     app.run(debug=debug, port=port, host='0.0.0.0')
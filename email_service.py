@@ -92,6 +92,16 @@ def send_email_smtp(to_email, subject, html_body, text_body=None):
         return False
 
 
+def email_configured():
+    """True if email is enabled and the selected provider has the settings it needs"""
+    if not Settings.get_bool('email_enabled'):
+        return False
+    if Settings.get('email_provider', 'brevo') == 'brevo':
+        return bool(Settings.get('brevo_api_key')
+                    and (Settings.get('email_from_address') or Settings.get('smtp_username')))
+    return bool(Settings.get('smtp_server') and Settings.get('smtp_username'))
+
+
 def send_email(to_email, subject, html_body, text_body=None):
     """Send an email using the configured provider (Brevo or SMTP)"""
     if not Settings.get_bool('email_enabled'):
@@ -1316,10 +1326,7 @@ def check_and_send_reminders(app):
 
         for booking in bookings:
             # Calculate exact datetime of booking
-            booking_datetime = datetime.combine(
-                booking.booking_date,
-                datetime.strptime(booking.booking_time, '%H:%M').time()
-            )
+            booking_datetime = booking.starts_at
 
             # Only send if within the reminder window
             time_until_booking = booking_datetime - now
@@ -1434,7 +1441,7 @@ def send_test_email(to_email):
 
 def send_campaign_email(campaign, client, base_url='https://whitethornpiercing.co.uk'):
     """Send a campaign email to a single client with personalization"""
-    from models import CampaignRecipient
+    from models import CampaignRecipient, EmailCampaign
 
     # Get or create recipient record
     recipient = CampaignRecipient.query.filter_by(
@@ -1487,15 +1494,21 @@ def send_campaign_email(campaign, client, base_url='https://whitethornpiercing.c
         unsubscribe_url=unsubscribe_url
     )
 
-    # Update recipient status
+    # Update recipient status; the campaign counters are incremented in SQL
+    # so recipients sent concurrently don't overwrite each other's counts
     if success:
         recipient.status = 'sent'
         recipient.sent_at = datetime.utcnow()
-        campaign.sent_count = (campaign.sent_count or 0) + 1
+        counter = 'sent_count'
     else:
         recipient.status = 'failed'
         recipient.error_message = 'Failed to send'
-        campaign.failed_count = (campaign.failed_count or 0) + 1
+        counter = 'failed_count'
+    column = getattr(EmailCampaign, counter)
+    db.session.execute(
+        db.update(EmailCampaign).where(EmailCampaign.id == campaign.id)
+        .values({counter: db.func.coalesce(column, 0) + 1})
+    )
 
     db.session.commit()
     return success
@@ -175,6 +175,45 @@ def migrate():
         else:
             raise
 
+    # Add integer minute columns alongside the 'HH:MM' time strings
+    # (the app backfills existing rows on startup)
+    for table, column in (('booking', 'booking_time_min'), ('booking', 'end_time_min'),
+                          ('blocked_time', 'start_time_min'), ('blocked_time', 'end_time_min')):
+        print(f"Adding {column} to {table} table...")
+        try:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} SMALLINT')
+            print(f"  Added {column} column")
+        except sqlite3.OperationalError as e:
+            if 'duplicate column name' in str(e).lower():
+                print(f"  {column} column already exists")
+            else:
+                raise
+
+    # Add normalized contact columns used to match bookings to clients
+    # (the app backfills existing rows on startup)
+    for column, column_type in (('customer_email_normalized', 'VARCHAR(120)'), ('customer_phone_normalized', 'VARCHAR(20)')):
+        print(f"Adding {column} to booking table...")
+        try:
+            cursor.execute(f'ALTER TABLE booking ADD COLUMN {column} {column_type}')
+            print(f"  Added {column} column")
+        except sqlite3.OperationalError as e:
+            if 'duplicate column name' in str(e).lower():
+                print(f"  {column} column already exists")
+            else:
+                raise
+
+    # Create indexes for availability checks
+    print("Creating booking and blocked_time indexes...")
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_booking_date_status ON booking(booking_date, status)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_booking_date_time ON booking(booking_date, booking_time_min, end_time_min)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_booking_user_status_date ON booking(user_id, status, booking_date, booking_time)')
+    cursor.execute('DROP INDEX IF EXISTS ix_booking_email_lower_status_date')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_clientnote_email_lower ON client_note(lower(client_email))')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_booking_customer_email_normalized ON booking(customer_email_normalized)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_booking_customer_phone_normalized ON booking(customer_phone_normalized)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_blocked_date ON blocked_time(date)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS ix_blocked_recurring ON blocked_time(is_recurring_weekly, recurring_day_of_week, is_all_day)')
+
     conn.commit()
     conn.close()
 
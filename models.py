@@ -1,9 +1,81 @@
+import base64
+import os
+import threading
+import time
+from functools import lru_cache
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import validates
+from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 
 db = SQLAlchemy()
 
+# Cache marker for a setting with no stored row
+_MISSING = object()
+
+# INSERT constructs that support ON CONFLICT DO UPDATE, by dialect name
+UPSERT_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+# Hash method for new passwords. Defaults to werkzeug's PBKDF2 iteration count;
+# set e.g. pbkdf2:sha256:600000 to deliberately trade strength for CPU on a slow host.
+# Existing hashes keep the method they were created with.
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+
+
+def time_str_to_minutes(time_str):
+    """Convert time string 'HH:MM' to minutes from midnight (None stays None)"""
+    if not time_str:
+        return None
+    h, m = time_str.split(':')
+    return int(h) * 60 + int(m)
+
+
+def normalize_email(email):
+    """Lowercased, trimmed email used to match clients (None if empty)"""
+    if not email:
+        return None
+    return email.lower().strip() or None
+
+
+# Deletes every non-digit Latin-1 character in one C-level pass
+_PHONE_KEEP = str.maketrans('', '', ''.join(chr(c) for c in range(256) if not chr(c).isdigit()))
+
+
+def phone_digits(phone):
+    """Just the digits of a phone number ('' if none)"""
+    if not phone or phone.isdigit():
+        return phone or ''
+    digits = phone.translate(_PHONE_KEEP)
+    if not digits.isdigit():
+        # Characters outside Latin-1 survive the table; filter them the slow way
+        digits = ''.join(c for c in digits if c.isdigit())
+    return digits
+
+
+def normalize_phone(phone):
+    """Normalize phone number for comparison (remove spaces, dashes, etc.)"""
+    normalized = phone_digits(phone)
+    # Return None if too short to be valid
+    return normalized if len(normalized) >= 7 else None
+
+
+def unsubscribe_tokens(block_size=256):
+    """
+    Endless supply of tokens in the same form as secrets.token_urlsafe(32), drawing
+    random bytes for block_size tokens at a time instead of one syscall per token.
+    """
+    while True:
+        block = os.urandom(32 * block_size)
+        for start in range(0, len(block), 32):
+            yield base64.urlsafe_b64encode(block[start:start + 32]).rstrip(b'=').decode('ascii')
+
+
+@lru_cache(maxsize=1)
+def dummy_password_hash():
+    """Hash checked against when a login username doesn't exist, so it takes as long as a wrong password"""
+    return generate_password_hash(os.urandom(16).hex(), method=PASSWORD_HASH_METHOD)
+
 
 class User(db.Model):
     """Customer user accounts"""
@@ -23,7 +95,7 @@ class User(db.Model):
 
     def set_password(self, password):
         """Hash and set the password"""
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        self.password_hash = generate_password_hash(password, method=PASSWORD_HASH_METHOD)
 
     def check_password(self, password):
         """Check if password matches"""
@@ -43,7 +115,7 @@ class Category(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    services = db.relationship('Service', backref='category', lazy=True, order_by='Service.display_order')
+    services = db.relationship('Service', back_populates='category', lazy=True, order_by='Service.display_order')
 
     def __repr__(self):
         return f'<Category {self.name}>'
@@ -63,6 +135,7 @@ class Service(db.Model):
     display_order = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    category = db.relationship('Category', back_populates='services')
     bookings = db.relationship('Booking', backref='service', lazy=True)
 
     def __repr__(self):
@@ -97,11 +170,20 @@ class Booking(db.Model):
     customer_email = db.Column(db.String(120), nullable=False)
     customer_phone = db.Column(db.String(20))
 
+    # Contact details as used to match clients, kept in sync with the fields above
+    customer_email_normalized = db.Column(db.String(120), index=True)
+    customer_phone_normalized = db.Column(db.String(20), index=True)
+
     # Booking details - store both start and end times
     booking_date = db.Column(db.Date, nullable=False)
     booking_time = db.Column(db.String(5), nullable=False)  # Start time "09:00"
     end_time = db.Column(db.String(5), nullable=False)      # End time "09:30"
 
+    # Same times as minutes from midnight, kept in sync with the strings above
+    # so overlap checks can compare integers in SQL
+    booking_time_min = db.Column(db.SmallInteger)  # 540
+    end_time_min = db.Column(db.SmallInteger)      # 570
+
     # Status: confirmed, cancelled, completed, no_show
     status = db.Column(db.String(20), default='confirmed')
     no_show_at = db.Column(db.DateTime, nullable=True)  # When marked as no-show
@@ -120,6 +202,50 @@ class Booking(db.Model):
     intake_form_id = db.Column(db.Integer, db.ForeignKey('intake_form.id'), nullable=True)
     intake_form = db.relationship('IntakeForm', backref='booking', uselist=False)
 
+    # Availability checks and auto-complete filter on date + status
+    __table_args__ = (
+        db.Index('ix_booking_date_status', 'booking_date', 'status'),
+        db.Index('ix_booking_date_time', 'booking_date', 'booking_time_min', 'end_time_min'),
+        # Customer pages filter by user and status, then range/order by date and time
+        db.Index('ix_booking_user_status_date', 'user_id', 'status', 'booking_date', 'booking_time'),
+    )
+
+    @classmethod
+    def contact_filter(cls, email=None, phone=None):
+        """
+        Filter for bookings matching an email OR phone, compared in normalized
+        form so the lookup uses the normalized column indexes
+        """
+        conditions = []
+        email = normalize_email(email)
+        phone = normalize_phone(phone)
+        if email:
+            conditions.append(cls.customer_email_normalized == email)
+        if phone:
+            conditions.append(cls.customer_phone_normalized == phone)
+        return db.or_(*conditions) if conditions else db.false()
+
+    @validates('booking_time', 'end_time')
+    def sync_time_minutes(self, key, value):
+        """Keep the *_min columns in step when a time string is set"""
+        setattr(self, f'{key}_min', time_str_to_minutes(value))
+        return value
+
+    @validates('customer_email', 'customer_phone')
+    def sync_normalized_contact(self, key, value):
+        """Keep the *_normalized columns in step when contact details are set"""
+        normalize = normalize_email if key == 'customer_email' else normalize_phone
+        setattr(self, f'{key}_normalized', normalize(value))
+        return value
+
+    @property
+    def starts_at(self):
+        """Appointment start as a datetime, built from booking_time_min rather than parsing the string"""
+        minutes = self.booking_time_min
+        if minutes is None:
+            minutes = time_str_to_minutes(self.booking_time)
+        return datetime.combine(self.booking_date, datetime.min.time()) + timedelta(minutes=minutes)
+
     def __repr__(self):
         return f'<Booking {self.customer_name} - {self.booking_date} {self.booking_time}>'
 
@@ -165,12 +291,26 @@ class BlockedTime(db.Model):
     date = db.Column(db.Date, nullable=False)
     start_time = db.Column(db.String(5), nullable=True)  # "12:00" - null means all day
     end_time = db.Column(db.String(5), nullable=True)    # "13:00" - null means all day
+    start_time_min = db.Column(db.SmallInteger, nullable=True)  # start_time as minutes from midnight
+    end_time_min = db.Column(db.SmallInteger, nullable=True)    # end_time as minutes from midnight
     reason = db.Column(db.String(100))  # "Lunch", "Break", "Day Off", etc.
     is_all_day = db.Column(db.Boolean, default=False)
     is_recurring_weekly = db.Column(db.Boolean, default=False)  # For recurring breaks like daily lunch
     recurring_day_of_week = db.Column(db.Integer, nullable=True)  # 0=Monday, 6=Sunday (for recurring)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Blocks are looked up by specific date or by recurring day of week
+    __table_args__ = (
+        db.Index('ix_blocked_date', 'date'),
+        db.Index('ix_blocked_recurring', 'is_recurring_weekly', 'recurring_day_of_week', 'is_all_day'),
+    )
+
+    @validates('start_time', 'end_time')
+    def sync_time_minutes(self, key, value):
+        """Keep the *_min columns in step when a time string is set"""
+        setattr(self, f'{key}_min', time_str_to_minutes(value))
+        return value
+
     def __repr__(self):
         if self.is_all_day:
             return f'<BlockedTime {self.date} ALL DAY - {self.reason}>'
@@ -214,12 +354,37 @@ class Settings(db.Model):
         'send_followup_email': 'true',
     }
 
+    # Process-local cache of stored values, {key: (expires_at, value)}; _MISSING
+    # marks keys with no row. Other workers see changes once their entry expires.
+    CACHE_TTL_SECONDS = 60
+    _cache = {}
+    _cache_lock = threading.Lock()
+
+    @classmethod
+    def _cache_values(cls, values):
+        expires_at = time.monotonic() + cls.CACHE_TTL_SECONDS
+        with cls._cache_lock:
+            for key, value in values.items():
+                cls._cache[key] = (expires_at, value)
+
+    @classmethod
+    def clear_cache(cls):
+        """Forget all cached setting values"""
+        with cls._cache_lock:
+            cls._cache.clear()
+
     @classmethod
     def get(cls, key, default=None):
-        """Get a setting value"""
-        setting = cls.query.filter_by(key=key).first()
-        if setting:
-            return setting.value
+        """Get a setting value (cached for CACHE_TTL_SECONDS)"""
+        entry = cls._cache.get(key)
+        if entry and entry[0] > time.monotonic():
+            value = entry[1]
+        else:
+            row = db.session.execute(db.select(cls.value).filter_by(key=key)).first()
+            value = row.value if row else _MISSING
+            cls._cache_values({key: value})
+        if value is not _MISSING:
+            return value
         return cls.DEFAULTS.get(key, default)
 
     @classmethod
@@ -232,6 +397,39 @@ class Settings(db.Model):
             setting = cls(key=key, value=value)
             db.session.add(setting)
         db.session.commit()
+        cls._cache_values({key: value})
+
+    @classmethod
+    def get_many(cls, keys, defaults=None):
+        """Get several setting values in one query (falls back like get)"""
+        defaults = defaults or {}
+        stored = dict(db.session.execute(
+            db.select(cls.key, cls.value).filter(cls.key.in_(keys))
+        ).all())
+        cls._cache_values({key: stored.get(key, _MISSING) for key in keys})
+        return {
+            key: stored[key] if key in stored else cls.DEFAULTS.get(key, defaults.get(key))
+            for key in keys
+        }
+
+    @classmethod
+    def set_many(cls, values):
+        """Set several settings with a single upsert (or one lookup where unsupported) and one commit"""
+        upsert = UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+        if upsert:
+            stmt = upsert(cls).values([{'key': key, 'value': value} for key, value in values.items()])
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=[cls.key], set_={'value': stmt.excluded.value}
+            ))
+        else:
+            existing = {s.key: s for s in cls.query.filter(cls.key.in_(list(values))).all()}
+            for key, value in values.items():
+                if key in existing:
+                    existing[key].value = value
+                else:
+                    db.session.add(cls(key=key, value=value))
+        db.session.commit()
+        cls._cache_values(values)
 
     @classmethod
     def get_bool(cls, key, default=False):
@@ -284,6 +482,10 @@ class ClientNote(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_clientnote_email_lower', db.func.lower(client_email)),
+    )
+
     def __repr__(self):
         return f'<ClientNote {self.client_email}>'
 
@@ -320,6 +522,15 @@ class Client(db.Model):
     # Relationships
     tags = db.relationship('ClientTag', secondary='client_tag_assignment', backref='clients')
 
+    # Partial index over emailable opted-in clients, newest first: serves the
+    # opted-in client list, campaign recipient lists and their counts
+    _emailable = db.and_(email_opt_in == True, unsubscribed_at.is_(None), email.isnot(None))
+    __table_args__ = (
+        db.Index('ix_client_emailable_created', created_at.desc(),
+                 postgresql_where=_emailable, sqlite_where=_emailable),
+    )
+    del _emailable
+
     def __repr__(self):
         return f'<Client {self.name} - {self.email}>'
 
@@ -337,11 +548,11 @@ class Client(db.Model):
         # If not found, try by phone
         if not client and phone:
             # Normalize phone for comparison
-            normalized_phone = ''.join(filter(str.isdigit, phone)) if phone else None
+            normalized_phone = phone_digits(phone)
             if normalized_phone:
                 all_clients = cls.query.filter(cls.phone.isnot(None)).all()
                 for c in all_clients:
-                    c_phone = ''.join(filter(str.isdigit, c.phone)) if c.phone else ''
+                    c_phone = phone_digits(c.phone)
                     if c_phone and c_phone == normalized_phone:
                         client = c
                         break
@@ -375,12 +586,7 @@ class Client(db.Model):
 
         # Count bookings matching this client's email or phone
         query = Booking.query.filter(
-            db.or_(
-                Booking.customer_email == self.email,
-                Booking.customer_phone == self.phone
-            ) if self.email and self.phone else (
-                Booking.customer_email == self.email if self.email else Booking.customer_phone == self.phone
-            )
+            Booking.contact_filter(self.email, self.phone)
         ).filter(Booking.status != 'cancelled')
 
         self.total_bookings = query.count()
@@ -419,8 +625,12 @@ class ClientTagAssignment(db.Model):
     tag_id = db.Column(db.Integer, db.ForeignKey('client_tag.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    # Ensure unique client-tag pairs
-    __table_args__ = (db.UniqueConstraint('client_id', 'tag_id', name='unique_client_tag'),)
+    # Ensure unique client-tag pairs (also serves lookups by client_id);
+    # the reverse index serves joins filtered by tag
+    __table_args__ = (
+        db.UniqueConstraint('client_id', 'tag_id', name='unique_client_tag'),
+        db.Index('ix_client_tag_assignment_tag_client', 'tag_id', 'client_id'),
+    )
 
 
 class EmailCampaign(db.Model):
@@ -531,7 +741,7 @@ class AdminUser(db.Model):
 
     def set_password(self, password):
         """Hash and set the password"""
-        self.password_hash = generate_password_hash(password, method='pbkdf2:sha256')
+        self.password_hash = generate_password_hash(password, method=PASSWORD_HASH_METHOD)
 
     def check_password(self, password):
         """Check if password matches"""
@@ -567,6 +777,11 @@ class ActivityLog(db.Model):
     # Relationships
     booking = db.relationship('Booking', backref='activity_logs', lazy=True)
 
+    # Notification bell: unread count and mark-all-read filter on is_read
+    __table_args__ = (
+        db.Index('ix_activitylog_is_read_created', is_read, created_at.desc()),
+    )
+
     # Action types
     ACTION_TYPES = {
         'booking_created': 'New Booking',
@@ -585,17 +800,29 @@ class ActivityLog(db.Model):
         'owner_login': 'Owner Login',
     }
 
+    # Set by the app to hand entries to a background batch writer
+    writer = None
+
     @classmethod
-    def log(cls, action_type, description, admin_user_id=None, booking_id=None, client_email=None, details=None):
-        """Create a new activity log entry"""
-        log_entry = cls(
+    def log(cls, action_type, description, admin_user_id=None, booking_id=None, client_email=None, details=None, sync=False):
+        """
+        Create a new activity log entry. Entries go to the background writer when
+        one is running; pass sync=True to insert and commit before returning.
+        """
+        row = dict(
             admin_user_id=admin_user_id,
             action_type=action_type,
             description=description,
             booking_id=booking_id,
             client_email=client_email,
-            details=details
+            details=details,
+            created_at=datetime.utcnow()
         )
+        if not sync and cls.writer is not None:
+            cls.writer(row)
+            return None
+
+        log_entry = cls(**row)
         db.session.add(log_entry)
         db.session.commit()
         return log_entry